@@ -0,0 +1,435 @@
+"""Benchmark từng bước của quy trình tạo giấy khen
+
+Tạo template và danh sách giả lập (không cần file thật, không cần mạng), rồi đo
+thời gian từng bước: đọc danh sách, render, ghi file, chuyển PDF (từng engine
+DOCX) và gộp PDF cho mỗi engine có thể chạy. Kết quả ghi ra file JSON để so sánh giữa các commit.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --sizes 10,1000 --compare benchmarks/results/cu.json
+"""
+import argparse
+import configparser
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.certificate.generator import LAYOUT_ENGINES, RENDER_ENGINES, CertificateGenerator  # noqa: E402
+from src.converter.converters import create_converter  # noqa: E402
+from src.io.pdf_writer import StreamingPdfWriter  # noqa: E402
+from src.io.roster import iter_roster  # noqa: E402
+
+DEFAULT_SIZES = (10, 1000, 10000)
+HEADER_ROW = 5
+SEED = 20250815
+# Font có sẵn trên Linux dùng cho engine overlay (cần hỗ trợ tiếng Việt)
+FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSerif-Regular.ttf',
+)
+HO = ('Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Võ', 'Đặng', 'Bùi')
+DEM = ('Văn', 'Thị', 'Minh', 'Ngọc', 'Quang', 'Thanh', 'Hữu', 'Đức')
+TEN = ('An', 'Bình', 'Châu', 'Dũng', 'Hạnh', 'Khoa', 'Lan', 'Nhân', 'Phúc', 'Tâm', 'Trí', 'Vy')
+PHAP_DANH = ('', 'Tâm Minh', 'Quảng Đức', 'Diệu Hạnh', 'Nguyên Tịnh')
+DON_VI = ('GĐPT Hải Châu', 'GĐPT Thanh Khê', 'GĐPT Sơn Trà', 'GĐPT Liên Chiểu', 'GĐPT Cẩm Lệ')
+
+logger = logging.getLogger('benchmark')
+
+
+def build_template(path):
+    """Template có đủ placeholder chuẩn ở paragraph, table và header"""
+    from docx import Document
+    from docx.shared import Pt
+
+    doc = Document()
+    header = doc.sections[0].header
+    header.paragraphs[0].text = 'GIA ĐÌNH PHẬT TỬ VIỆT NAM - <<Do>>'
+
+    title = doc.add_paragraph()
+    title.add_run('GIẤY KHEN').bold = True
+    doc.add_paragraph('Chứng nhận: <<Ho_va_ten>>')
+    # Placeholder bị tách thành nhiều run như khi gõ trong Word
+    split = doc.add_paragraph('Pháp danh: ')
+    split.add_run('<<Phap')
+    split.add_run('_danh>>').font.size = Pt(12)
+
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = 'Năm sinh'
+    table.cell(0, 1).text = '<<Nam_sinh>>'
+    table.cell(1, 0).text = 'Đơn vị'
+    table.cell(1, 1).text = '<<Don_vi>>'
+
+    for i in range(20):
+        doc.add_paragraph(f'Đoạn văn mẫu số {i + 1} không có placeholder.')
+    doc.add_paragraph('<<Tai>>, <<Ngay>>')
+    doc.save(str(path))
+    return path
+
+
+def build_layout(path, font_file):
+    """File layout cho engine layout với cùng các placeholder như template Word"""
+    fields = [
+        {'text': 'GIẤY KHEN', 'x': 421, 'y': 120, 'size': 36, 'align': 'center'},
+        {'text': '<<Ho_va_ten>>', 'x': 421, 'y': 240, 'size': 28, 'align': 'center', 'max_width': 600,
+         'color': '#B00000'},
+        {'text': 'Pháp danh: <<Phap_danh>>', 'x': 421, 'y': 290, 'size': 16, 'align': 'center'},
+        {'text': 'Năm sinh: <<Nam_sinh>> - <<Don_vi>>', 'x': 421, 'y': 330, 'size': 16, 'align': 'center'},
+        {'text': '<<Tai>>, <<Ngay>>', 'x': 780, 'y': 500, 'size': 14, 'align': 'right'},
+        {'text': '<<Do>>', 'x': 780, 'y': 530, 'size': 14, 'align': 'right'},
+    ]
+    path.write_text(json.dumps({
+        'page': 'A4-L', 'fonts': {'regular': str(font_file)}, 'fields': fields,
+    }, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+def build_roster(path, rows):
+    """Danh sách giả lập theo định dạng thật: tiêu đề ở trên, header ở hàng 5"""
+    import openpyxl
+
+    rng = random.Random(SEED + rows)
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Danh sách')
+    for i in range(HEADER_ROW - 1):
+        sheet.append([f'Tiêu đề {i + 1}'] if i == 0 else [])
+    sheet.append(['Tt', 'Họ và tên', 'Pháp danh', 'Năm sinh', 'Đơn vị', 'Điểm', 'Ghi chú'])
+    for i in range(rows):
+        sheet.append([
+            i + 1,
+            f'{rng.choice(HO)} {rng.choice(DEM)} {rng.choice(TEN)}',
+            rng.choice(PHAP_DANH) or None,
+            rng.randint(1990, 2012),
+            rng.choice(DON_VI),
+            round(rng.uniform(5, 10), 1),
+            None,
+        ])
+    workbook.save(str(path))
+    return path
+
+
+def make_config(engine, font_file='', template_pdf=''):
+    config = configparser.ConfigParser()
+    config.read_dict({
+        'CERTIFICATE': {'issued_by': 'Ban Hướng Dẫn', 'issued_at': 'Đà Nẵng', 'issued_date': 'ngày 15 tháng 8 năm 2025'},
+        'EXCEL': {'header_row': str(HEADER_ROW)},
+        'PERFORMANCE': {'render_engine': engine},
+        'OVERLAY': {'template_pdf': str(template_pdf), 'font_file': str(font_file)},
+    })
+    return config
+
+
+def converter_config(args):
+    config = make_config('docx')
+    if args.soffice:
+        config.set('PERFORMANCE', 'soffice_path', args.soffice)
+    return config
+
+
+def timing(samples):
+    """Tổng thời gian và thời gian trung bình / trung vị mỗi file (ms)"""
+    if not samples:
+        return None
+    return {
+        'count': len(samples),
+        'total_s': round(sum(samples), 4),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+    }
+
+
+def bench_engine(engine, template, records, work_dir, args, template_pdf):
+    """Đo riêng bước render (thay placeholder) và bước ghi file của một engine
+
+    Thời gian ghi file lấy từ generator.last_save_seconds của chính lần render đó.
+    """
+    config = make_config(engine, args.font or '', template_pdf or '')
+    generator = CertificateGenerator(template, logger, config)
+    suffix = '.pdf' if generator.outputs_pdf else '.docx'
+    out_dir = work_dir / engine
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    render, save, outputs = [], [], []
+    for record in records:
+        output_file = out_dir / f"{record.file_stem}{suffix}"
+        started = time.perf_counter()
+        ok = generator.create_certificate(
+            record.ho_ten, record.phap_danh, record.nam_sinh, record.don_vi, output_file
+        )
+        elapsed = time.perf_counter() - started
+        if not ok:
+            raise RuntimeError(f"Engine {engine} không tạo được {output_file.name}")
+        render.append(elapsed - generator.last_save_seconds)
+        save.append(generator.last_save_seconds)
+        outputs.append(output_file)
+
+    return generator.outputs_pdf, outputs, {'render': timing(render), 'save': timing(save)}
+
+
+def bench_convert(converter, docx_files, pdf_dir, args):
+    """Chuyển một phần file DOCX sang PDF bằng bộ chuyển đã khởi động"""
+    samples, pdfs = [], []
+    for docx_file in docx_files[:args.pdf_sample]:
+        pdf_file = pdf_dir / f"{docx_file.stem}.pdf"
+        started = time.perf_counter()
+        converter.convert(docx_file, pdf_file)
+        samples.append(time.perf_counter() - started)
+        pdfs.append(pdf_file)
+    return pdfs, timing(samples)
+
+
+def bench_convert_engines(docx_outputs, work_dir, size_result, args):
+    """Đo chuyển PDF cho file DOCX của từng engine (cùng một bộ chuyển), trả về PDF của engine đầu tiên"""
+    if args.no_pdf:
+        size_result['skipped']['pdf_convert'] = '--no-pdf'
+        print("  ⏭️ Bỏ qua chuyển PDF (--no-pdf)")
+        return []
+    try:
+        converter = create_converter(converter_config(args), logger)
+        started = time.perf_counter()
+        converter.start()
+    except Exception as e:
+        size_result['skipped']['pdf_convert'] = str(e)
+        print(f"  ⏭️ Bỏ qua chuyển PDF: {e}")
+        return []
+    size_result['pdf_convert_startup_s'] = round(time.perf_counter() - started, 4)
+
+    first = []
+    try:
+        for engine, docx_files in docx_outputs.items():
+            pdf_dir = work_dir / 'pdf' / engine
+            pdf_dir.mkdir(parents=True)
+            try:
+                converted, result = bench_convert(converter, docx_files, pdf_dir, args)
+            except Exception as e:
+                size_result['skipped'][f"{engine}.pdf_convert"] = str(e)
+                print(f"  ⏭️ {engine}: bỏ qua chuyển PDF: {e}")
+                continue
+            size_result['engines'][engine]['pdf_convert'] = result
+            print(f"  🖨️ {engine}: chuyển PDF {result['mean_ms']:.1f} ms/file")
+            if converted and not first:
+                first = converted
+    finally:
+        converter.stop()
+    return first
+
+
+def sample_pdfs(count, pdf_dir):
+    """PDF một trang dựng bằng PyPDF2, dùng khi máy không có bộ chuyển PDF"""
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    writer.add_blank_page(width=842, height=595)
+    source = pdf_dir / 'sample.pdf'
+    with open(source, 'wb') as f:
+        writer.write(f)
+    return [source] * count
+
+
+def bench_merge(pdf_files, count, work_dir, deduplicate):
+    """Gộp count file PDF (lặp lại các file có sẵn) bằng StreamingPdfWriter"""
+    combined = work_dir / f"combined_{'dedup' if deduplicate else 'plain'}.pdf"
+    writer = StreamingPdfWriter(combined, logger=logger, deduplicate=deduplicate)
+    started = time.perf_counter()
+    for seq in range(count):
+        writer.append(pdf_files[seq % len(pdf_files)], seq)
+    pages = writer.close()
+    elapsed = time.perf_counter() - started
+    return {
+        'files': count,
+        'pages': pages,
+        'total_s': round(elapsed, 4),
+        'per_file_ms': round(elapsed / count * 1000, 3),
+        'size_bytes': combined.stat().st_size,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def run(args):
+    results = {'environment': environment(), 'sizes': {}}
+    work_root = Path(tempfile.mkdtemp(prefix='certifynow_bench_'))
+    try:
+        template = build_template(work_root / 'template.docx')
+        layout = build_layout(work_root / 'layout.json', args.font) if args.font else None
+        template_pdf = args.template_pdf
+        if 'overlay' in args.engines and args.font and not template_pdf and not args.no_pdf:
+            # Engine overlay cần bản PDF của template: chuyển một lần nếu máy có bộ chuyển
+            try:
+                template_pdf = work_root / 'template.pdf'
+                converter = create_converter(converter_config(args), logger)
+                converter.start()
+                try:
+                    converter.convert(template, template_pdf)
+                finally:
+                    converter.stop()
+            except Exception as e:
+                template_pdf = None
+                results['overlay_unavailable'] = str(e)
+
+        for size in args.sizes:
+            print(f"📏 {size} bản ghi")
+            work_dir = work_root / str(size)
+            work_dir.mkdir()
+            size_result = {'engines': {}, 'skipped': {}}
+            results['sizes'][str(size)] = size_result
+
+            roster = build_roster(work_dir / 'roster.xlsx', size)
+            config = make_config('docx')
+            started = time.perf_counter()
+            records = list(iter_roster(roster, config))
+            size_result['roster_load_s'] = round(time.perf_counter() - started, 4)
+            print(f"  📊 Đọc danh sách: {size_result['roster_load_s']:.3f}s")
+
+            docx_outputs, pdf_files = {}, []
+            for engine in args.engines:
+                if engine == 'overlay' and not (template_pdf and args.font):
+                    size_result['skipped'][engine] = results.get(
+                        'overlay_unavailable', 'cần --template-pdf và --font (hoặc bộ chuyển PDF)'
+                    )
+                    continue
+                if engine in LAYOUT_ENGINES and not layout:
+                    size_result['skipped'][engine] = 'cần --font'
+                    continue
+                try:
+                    outputs_pdf, outputs, stages = bench_engine(
+                        engine, layout if engine in LAYOUT_ENGINES else template, records, work_dir, args, template_pdf
+                    )
+                except Exception as e:
+                    size_result['skipped'][engine] = str(e)
+                    continue
+                size_result['engines'][engine] = stages
+                print(f"  🧩 {engine}: render {stages['render']['mean_ms']:.2f} ms/giấy khen, "
+                      f"ghi file {stages['save']['mean_ms']:.2f} ms")
+                if outputs_pdf:
+                    # Engine ghi thẳng PDF: không có bước chuyển PDF
+                    if not pdf_files:
+                        pdf_files = outputs
+                        size_result['merge_source'] = engine
+                else:
+                    docx_outputs[engine] = outputs
+
+            if docx_outputs:
+                converted = bench_convert_engines(docx_outputs, work_dir, size_result, args)
+                if converted:
+                    pdf_files = converted
+                    size_result['merge_source'] = 'pdf_convert'
+
+            if not pdf_files:
+                pdf_dir = work_dir / 'sample_pdf'
+                pdf_dir.mkdir(exist_ok=True)
+                pdf_files = sample_pdfs(size, pdf_dir)
+                size_result['merge_source'] = 'sample'
+            for deduplicate in (False, True):
+                key = 'merge_dedup' if deduplicate else 'merge'
+                size_result[key] = bench_merge(pdf_files, size, work_dir, deduplicate)
+            print(f"  📚 Gộp PDF: {size_result['merge']['per_file_ms']:.2f} ms/file")
+    finally:
+        if args.keep:
+            print(f"📁 Giữ thư mục làm việc: {work_root}")
+        else:
+            shutil.rmtree(work_root, ignore_errors=True)
+    return results
+
+
+def compare(current, previous):
+    """In tỉ lệ thời gian so với một kết quả cũ (< 1 là nhanh hơn)"""
+    print(f"\n⚖️ So với {previous['environment'].get('commit') or 'kết quả cũ'}:")
+    for size, now in current['sizes'].items():
+        before = previous['sizes'].get(size)
+        if not before:
+            continue
+        pairs = [('roster_load', now.get('roster_load_s'), before.get('roster_load_s'))]
+        for engine, stages in now['engines'].items():
+            old = before['engines'].get(engine, {})
+            for stage in ('render', 'save', 'pdf_convert'):
+                pairs.append((
+                    f"{engine}.{stage}", (stages.get(stage) or {}).get('mean_ms'), (old.get(stage) or {}).get('mean_ms')
+                ))
+        for key in ('merge', 'merge_dedup'):
+            # Chỉ so thời gian gộp khi cùng loại file PDF đầu vào
+            if now.get('merge_source') != before.get('merge_source'):
+                continue
+            pairs.append((key, (now.get(key) or {}).get('per_file_ms'), (before.get(key) or {}).get('per_file_ms')))
+        for name, new_value, old_value in pairs:
+            if new_value and old_value:
+                print(f"  [{size:>5}] {name:18} {old_value:10.3f} → {new_value:10.3f}  (x{new_value / old_value:.2f})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark quy trình tạo giấy khen")
+    parser.add_argument(
+        '--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+        type=lambda value: [int(v) for v in value.split(',') if v.strip()],
+        help="Số bản ghi của các danh sách giả lập (mặc định: 10,1000,10000)"
+    )
+    parser.add_argument(
+        '--engines', default=','.join(RENDER_ENGINES),
+        type=lambda value: [v.strip() for v in value.split(',') if v.strip()],
+        help="Các engine cần đo (mặc định: tất cả)"
+    )
+    parser.add_argument('--output', help="File JSON kết quả (mặc định: benchmarks/results/<thời gian>_<commit>.json)")
+    parser.add_argument('--compare', help="File JSON kết quả cũ để so sánh")
+    parser.add_argument('--font', default=next((f for f in FONT_CANDIDATES if os.path.exists(f)), None),
+                        help="Font cho engine overlay")
+    parser.add_argument('--template-pdf', help="Template PDF cho engine overlay (mặc định: chuyển từ template giả lập)")
+    parser.add_argument('--soffice', help="Đường dẫn soffice")
+    parser.add_argument(
+        '--pdf-sample', type=int, default=20, help="Số file DOCX của mỗi engine được chuyển PDF để đo (mặc định: 20)"
+    )
+    parser.add_argument('--no-pdf', action='store_true', help="Không đo bước chuyển PDF")
+    parser.add_argument('--keep', action='store_true', help="Giữ lại thư mục làm việc tạm")
+    args = parser.parse_args(argv)
+    for engine in args.engines:
+        if engine not in RENDER_ENGINES:
+            parser.error(f"engine không hợp lệ: {engine} (chọn: {', '.join(RENDER_ENGINES)})")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+
+    results = run(args)
+    output = Path(args.output) if args.output else (
+        ROOT / 'benchmarks' / 'results'
+        / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{results['environment']['commit'] or 'local'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n💾 Đã ghi kết quả: {output}")
+
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text(encoding='utf-8')))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
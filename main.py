@@ -1,41 +1,63 @@
 import os
 import sys
-import pandas as pd
 from docx import Document
-from docx2pdf import convert
 import shutil
 from datetime import datetime
 import configparser
+import argparse
+import json
+import signal
+from contextlib import redirect_stdout
+import time
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Import các module từ src
-from src.certificate.generator import CertificateGenerator
+from src.certificate.generator import LAYOUT_ENGINES, RENDER_ENGINES, CertificateGenerator
+from src.certificate.parallel import iter_render_parallel, render_record
+from src.certificate.pipeline import Stage, run_pipeline
+from src.certificate.session import WarmSession
+from src.converter.converters import create_converter
+from src.converter.pool import resolve_workers
 from src.io.file_handler import create_folders, validate_files
-from src.logging.logger_setup import setup_logger
+from src.io.manifest import RunManifest
+from src.io.roster import FILENAME_TABLE, RosterSource, find_sources, iter_roster
+from src.io.pdf_writer import StreamingPdfWriter, merge_pdf_files
+from src.io.watcher import FolderWatcher
+from src.logging.logger_setup import logging_settings, setup_logger
+from src.logging.metrics import RunMetrics
+from src.service.http_service import CertificateService, create_server
 
-def load_config():
+# Mã thoát cho chạy tự động (cron, hàng đợi job)
+EXIT_OK = 0            # Tất cả giấy khen đã có PDF
+EXIT_FAILED = 1        # Lỗi khi chạy hoặc không tạo được giấy khen nào
+EXIT_USAGE = 2         # Tham số dòng lệnh sai (argparse)
+EXIT_INPUT_ERROR = 3   # Thiếu template, danh sách hoặc không có dữ liệu hợp lệ
+EXIT_PARTIAL = 4       # Một phần giấy khen bị lỗi
+EXIT_CANCELLED = 5     # Người dùng hủy ở bước xác nhận
+
+EXIT_STATUS = {
+    EXIT_OK: 'ok',
+    EXIT_FAILED: 'failed',
+    EXIT_INPUT_ERROR: 'input_error',
+    EXIT_PARTIAL: 'partial',
+    EXIT_CANCELLED: 'cancelled',
+}
+
+def load_config(config_file='config.ini'):
     """Đọc cấu hình từ file config.ini"""
     config = configparser.ConfigParser()
-    config_file = 'config.ini'
     
     if os.path.exists(config_file):
         config.read(config_file, encoding='utf-8')
-        print("📃 Đã tải cấu hình từ config.ini")
+        print(f"📃 Đã tải cấu hình từ {config_file}")
     else:
         print("⚠️ Không tìm thấy config.ini, sử dụng cấu hình mặc định")
     
     return config
 
-def safe_str(value):
-    """Chuyển đổi giá trị sang string an toàn"""
-    if pd.isna(value) or value is None:
-        return ""
-    if isinstance(value, (int, float)):
-        if isinstance(value, float) and value.is_integer():
-            return str(int(value))
-        return str(value)
-    return str(value).strip()
-
 def display_config_info(config):
     """Hiển thị thông tin cấu hình placeholder"""
     print("\n📋 THÔNG TIN CẤU HÌNH PLACEHOLDER:")
@@ -70,50 +92,185 @@ def display_config_info(config):
     print("📱 OUTPUT: Chỉ tạo file PDF (không tạo DOCX)")
     print("-" * 70)
 
-def convert_to_pdf_safe(docx_path, pdf_path, logger):
-    """Chuyển đổi DOCX sang PDF an toàn"""
+def convert_to_pdf_safe(docx_path, pdf_path, logger, converter):
+    """Chuyển đổi DOCX sang PDF an toàn qua bộ chuyển đã khởi động sẵn
+
+    docx_path là đường dẫn file DOCX hoặc nội dung DOCX (bytes) đã render trong bộ nhớ.
+    """
     try:
-        docx_path = Path(docx_path)
         pdf_path = Path(pdf_path)
         
         # Đảm bảo thư mục output tồn tại
         pdf_path.parent.mkdir(parents=True, exist_ok=True)
         
-        if sys.platform == "win32":
-            # Windows: Sử dụng docx2pdf (cần MS Word)
-            try:
-                convert(str(docx_path), str(pdf_path))
-                logger.info(f"✅ Chuyển PDF thành công: {pdf_path.name}")
-                return True
-            except Exception as e:
-                logger.error(f"❌ Lỗi chuyển PDF bằng docx2pdf: {str(e)}")
-                return False
-            # Linux/Mac: Sử dụng LibreOffice (nếu có cài)
-            try:
-                import subprocess
-                cmd = [
-                    'libreoffice', '--headless', '--convert-to', 'pdf',
-                    '--outdir', str(pdf_path.parent), str(docx_path)
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-                if result.returncode == 0:
-                    logger.info(f"✅ Chuyển PDF thành công bằng LibreOffice: {pdf_path.name}")
-                    return True
-                else:
-                    logger.error(f"❌ LibreOffice lỗi: {result.stderr}")
-                    return False
-            except (subprocess.TimeoutExpired, FileNotFoundError) as e:
-                logger.error(f"❌ Không thể dùng LibreOffice: {str(e)}")
-                return False
+        if isinstance(docx_path, bytes):
+            converter.convert_bytes(docx_path, pdf_path)
+        else:
+            converter.convert(Path(docx_path), pdf_path)
+        logger.debug(f"✅ Chuyển PDF thành công: {pdf_path.name}")
+        return True
     except Exception as e:
         logger.error(f"❌ Lỗi chuyển PDF: {str(e)}")
         return False
 
-def main():
-    """Hàm chính của chương trình"""
+def build_combined_pdf_name(config, logger):
+    """Tạo tên file PDF gộp từ config - tránh lỗi % formatting"""
+    combined_name_template = config.get('OUTPUT', 'combined_pdf_name', 
+                                      fallback='Chung_chi_%Y%m%d_%H%M%S')
+    # Xử lý an toàn datetime placeholder
+    try:
+        # Escape % trong ConfigParser bằng cách dùng raw string
+        if '%' in combined_name_template:
+            combined_name = datetime.now().strftime(combined_name_template)
+            logger.info(f"🕒 Sử dụng datetime template: {combined_name_template}")
+        else:
+            # Nếu không có placeholder datetime, dùng tên gốc + timestamp
+            combined_name = f"{combined_name_template}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            logger.info(f"📝 Sử dụng tên tĩnh + timestamp: {combined_name}")
+    except (ValueError, TypeError) as e:
+        # Fallback nếu template có lỗi
+        fallback_name = f"GiayKhen_TongHop_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        combined_name = fallback_name
+        logger.warning(f"⚠️ Template không hợp lệ '{combined_name_template}', dùng mặc định: {fallback_name}")
+    return combined_name
+
+def write_summary(summary_path, summary, stream=None):
+    """Ghi tóm tắt lượt chạy ra file JSON ('-' = in ra stream, mặc định stdout)"""
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    if summary_path == '-':
+        print(text, file=stream or sys.stdout)
+        return
+    summary_path = Path(summary_path)
+    summary_path.parent.mkdir(parents=True, exist_ok=True)
+    summary_path.write_text(text, encoding='utf-8')
+
+def pick_file(explicit, folder, patterns):
+    """File được chỉ định qua tham số, hoặc file đầu tiên (theo tên) trong thư mục"""
+    if explicit:
+        explicit = Path(explicit)
+        return explicit if validate_files(explicit, patterns) else None
+    found = sorted(f for pattern in patterns for f in folder.glob(f"*{pattern}"))
+    return found[0] if found else None
+
+def jobs_value(value):
+    """Kiểu của tham số --jobs: 'auto' hoặc số nguyên dương, trả về số tiến trình"""
+    text = str(value).strip().lower()
+    if text != 'auto' and not (text.isdigit() and int(text) > 0):
+        raise argparse.ArgumentTypeError(f"phải là 'auto' hoặc số nguyên dương, không phải '{value}'")
+    return resolve_workers(text)
+
+def parse_args(argv=None):
+    """Đọc tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(
+        description="Tool tạo giấy khen tự động",
+        epilog=(
+            f"Mã thoát: {EXIT_OK} = thành công, {EXIT_FAILED} = lỗi, {EXIT_USAGE} = sai tham số, "
+            f"{EXIT_INPUT_ERROR} = thiếu/sai dữ liệu đầu vào, {EXIT_PARTIAL} = một phần bị lỗi, "
+            f"{EXIT_CANCELLED} = đã hủy"
+        ),
+    )
+    parser.add_argument('--template', help="File phôi .docx, hoặc .json với engine layout (mặc định: file đầu tiên trong thư mục templates)")
+    parser.add_argument(
+        '--roster', '--input', dest='roster',
+        help="File danh sách Excel (mặc định: file đầu tiên trong thư mục input)"
+    )
+    parser.add_argument('--output', help="Thư mục kết quả (mặc định: [PATHS] output_folder)")
+    parser.add_argument('--config', dest='config_file', default='config.ini', help="File cấu hình (mặc định: config.ini)")
+    parser.add_argument(
+        '--jobs', default=None, type=jobs_value,
+        help="Số tiến trình render song song (số nguyên hoặc 'auto' = số nhân CPU)"
+    )
+    parser.add_argument('--engine', choices=RENDER_ENGINES, help="Ghi đè [PERFORMANCE] render_engine")
+    parser.add_argument(
+        '-y', '--yes', action='store_true',
+        help="Không hỏi xác nhận (chạy tự động, không cần người dùng)"
+    )
+    parser.add_argument('--summary', help="Ghi tóm tắt lượt chạy dạng JSON ra file ('-' = stdout)")
+    parser.add_argument('--force', action='store_true', help="Tạo lại tất cả, bỏ qua manifest của lần chạy trước")
+    parser.add_argument(
+        '--metrics', dest='metrics_file',
+        help="Ghi thống kê thời gian ra file dạng Prometheus (mặc định: [OUTPUT] metrics_file)"
+    )
+    parser.add_argument(
+        '--all-sources', action='store_true',
+        help="Chạy mọi file Excel trong thư mục input (hoặc file --roster) và mọi sheet, "
+             "mỗi nguồn một thư mục kết quả riêng"
+    )
+    parser.add_argument(
+        '--group-by', dest='group_by',
+        help="Gộp PDF theo nhóm: mỗi giá trị của cột này (vd. DonVi, GhiChu) một file gộp (ghi đè [OUTPUT] group_by)"
+    )
+    parser.add_argument(
+        '--watch', action='store_true',
+        help="Chạy liên tục: theo dõi thư mục input và templates, tự tạo giấy khen cho danh sách mới/đã sửa "
+             "(template, bộ chuyển PDF và tiến trình render --jobs được giữ sẵn giữa các lượt; dừng bằng Ctrl+C hoặc SIGTERM)"
+    )
+    parser.add_argument(
+        '--serve', action='store_true',
+        help="Chạy dịch vụ HTTP tạo giấy khen đơn lẻ: POST /certificate (JSON) trả về PDF ([SERVICE] host, port)"
+    )
+    return parser.parse_args(argv)
+
+def main(summary=None, **options):
+    """Hàm chính của chương trình, trả về mã thoát (tham số: xem _main)
+
+    Với --summary - stdout chỉ chứa JSON tóm tắt: mọi thông báo được chuyển sang stderr.
+    """
+    if summary != '-':
+        return _main(summary=summary, **options)
+    summary_stream = sys.stdout
+    with redirect_stdout(sys.stderr):
+        return _main(summary=summary, summary_stream=summary_stream, **options)
+
+def _main(jobs=None, template=None, roster=None, output=None, config_file='config.ini',
+          engine=None, yes=False, summary=None, force=False, all_sources=False, metrics_file=None, group_by=None,
+          session=None, summary_stream=None):
+    """Một lượt tạo giấy khen, trả về mã thoát
+
+    session: WarmSession dùng lại template đã biên dịch và bộ chuyển PDF giữa các lượt (chế độ --watch)
+    summary_stream: nơi in JSON tóm tắt khi summary = '-'
+    """
     
-    # Khởi tạo logger
-    logger = setup_logger("CertificateGenerator", "INFO", True)
+    started = time.monotonic()
+    # Thời gian từng bước của lượt chạy
+    metrics = RunMetrics()
+    run_summary = {
+        'status': None,
+        'exit_code': None,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'template': None,
+        'roster': None,
+        'output_folder': None,
+        'render_engine': None,
+        'total': 0,
+        'created': 0,
+        'unchanged': 0,
+        'failed': [],
+        'combined_pdf': None,
+        'group_pdfs': {},
+    }
+
+    def finish(exit_code):
+        run_summary['status'] = EXIT_STATUS[exit_code]
+        run_summary['exit_code'] = exit_code
+        run_summary['duration_seconds'] = round(time.monotonic() - started, 3)
+        metrics.finish()
+        run_summary['metrics'] = metrics.summary(run_summary['created'])
+        if metrics_file:
+            try:
+                metrics.write_prometheus(metrics_file, {
+                    'created': run_summary['created'],
+                    'unchanged': run_summary['unchanged'],
+                    'failed': len(run_summary['failed']),
+                })
+            except OSError as e:
+                logger.error(f"❌ Không thể ghi file metrics: {str(e)}")
+        if summary:
+            try:
+                write_summary(summary, run_summary, summary_stream)
+            except OSError as e:
+                logger.error(f"❌ Không thể ghi file tóm tắt: {str(e)}")
+        return exit_code
     
     print("=" * 70)
     print("📄 TOOL TẠO GIẤY KHEN TỰ ĐỘNG - CHỈ PDF")
@@ -122,239 +279,496 @@ def main():
     print("=" * 70)
     
     # Đọc cấu hình
-    config = load_config()
+    config = load_config(config_file)
+
+    # Khởi tạo logger theo mục [LOGGING]
+    logger = setup_logger("CertificateGenerator", **logging_settings(config))
+    if engine:
+        if not config.has_section('PERFORMANCE'):
+            config.add_section('PERFORMANCE')
+        config.set('PERFORMANCE', 'render_engine', engine)
+    run_summary['render_engine'] = config.get('PERFORMANCE', 'render_engine', fallback='docx')
+    metrics_file = metrics_file or config.get('OUTPUT', 'metrics_file', fallback='').strip() or None
+    group_by = group_by or config.get('OUTPUT', 'group_by', fallback='').strip() or None
     
     # Hiển thị thông tin cấu hình
     display_config_info(config)
     
-    # Thiết lập đường dẫn
+    # Thiết lập đường dẫn (tham số dòng lệnh ưu tiên hơn mục [PATHS])
     base_dir = Path.cwd()
-    input_folder = base_dir / "input"
-    output_folder = base_dir / "output"
-    template_folder = base_dir / "templates"
-    temp_folder = base_dir / "temp"
+    input_folder = base_dir / config.get('PATHS', 'input_folder', fallback='input')
+    output_folder = Path(output) if output else base_dir / config.get('PATHS', 'output_folder', fallback='output')
+    template_folder = base_dir / config.get('PATHS', 'template_folder', fallback='templates')
+    temp_folder = base_dir / config.get('PATHS', 'temp_folder', fallback='temp')
+    run_summary['output_folder'] = str(output_folder)
+    # Render DOCX vào bộ nhớ và chuyển PDF thẳng từ đó - không ghi file DOCX tạm
+    in_memory = config.getboolean('PERFORMANCE', 'in_memory', fallback=True)
     
     # Tạo các thư mục cần thiết
-    create_folders([input_folder, output_folder, template_folder, temp_folder])
+    create_folders([input_folder, output_folder, template_folder] + ([] if in_memory else [temp_folder]))
     
-    # Kiểm tra file template
-    template_files = list(template_folder.glob("*.docx"))
-    if not template_files:
-        logger.error("❌ Không tìm thấy file phôi giấy khen (.docx) trong thư mục templates!")
+    # Kiểm tra file template (engine layout dùng file layout .json thay cho file Word)
+    template_suffix = '.json' if run_summary['render_engine'] in LAYOUT_ENGINES else '.docx'
+    template_file = pick_file(template, template_folder, [template_suffix])
+    if template_file is None:
+        if template:
+            logger.error(f"❌ File phôi không tồn tại hoặc không phải {template_suffix}: {template}")
+            return finish(EXIT_INPUT_ERROR)
+        logger.error(f"❌ Không tìm thấy file phôi giấy khen ({template_suffix}) trong thư mục templates!")
         print("\n💡 Hướng dẫn:")
-        print("1. Đặt file phôi giấy khen (định dạng .docx) vào thư mục 'templates'")
+        print(f"1. Đặt file phôi giấy khen (định dạng {template_suffix}) vào thư mục 'templates'")
         print("2. File phôi cần chứa các placeholder:")
         print("   - <<Ho_va_ten>>, <<Phap_danh>>, <<Nam_sinh>>, <<Don_vi>>")
         print("   - <<Do>>, <<Tai>>, <<Ngay>>")
         print("3. Chạy lại chương trình")
-        return
+        return finish(EXIT_INPUT_ERROR)
     
-    template_file = template_files[0]
     logger.info(f"📄 Sử dụng phôi: {template_file.name}")
+    run_summary['template'] = str(template_file)
     
     # Kiểm tra file Excel
-    excel_files = list(input_folder.glob("*.xlsx")) + list(input_folder.glob("*.xls"))
+    all_sources = all_sources or config.getboolean('EXCEL', 'all_sources', fallback=False)
+    if all_sources and not roster:
+        # Chạy tất cả các file Excel trong thư mục input
+        excel_files = sorted(
+            f for f in input_folder.iterdir()
+            if f.suffix.lower() in ('.xlsx', '.xls') and not f.name.startswith('~$')
+        ) if input_folder.exists() else []
+    else:
+        excel_file = pick_file(roster, input_folder, ['.xlsx', '.xls'])
+        excel_files = [excel_file] if excel_file else []
     if not excel_files:
+        if roster:
+            logger.error(f"❌ File danh sách không tồn tại hoặc không phải Excel: {roster}")
+            return finish(EXIT_INPUT_ERROR)
         logger.error("❌ Không tìm thấy file danh sách Excel trong thư mục input!")
         print("\n💡 Hướng dẫn:")
         print("1. Đặt file Excel chứa danh sách vào thư mục 'input'")
         print("2. File Excel cần có các cột: Họ và tên, Pháp danh, Năm sinh, Đơn vị")
         print("3. Chạy lại chương trình")
-        return
+        return finish(EXIT_INPUT_ERROR)
     
-    excel_file = excel_files[0]
-    logger.info(f"📊 Đọc danh sách từ: {excel_file.name}")
+    for excel_file in excel_files:
+        logger.info(f"📊 Đọc danh sách từ: {excel_file.name}")
+    run_summary['roster'] = str(excel_files[0]) if len(excel_files) == 1 else [str(f) for f in excel_files]
     
     try:
-        # Đọc dữ liệu từ Excel
-        header_row = config.getint('EXCEL', 'header_row', fallback=5) - 1  # Convert to 0-based index
-        df = pd.read_excel(excel_file, header=header_row)
-        
-        # Lọc và làm sạch dữ liệu
-        df = df.dropna(subset=['Họ và tên'])  # Bỏ các hàng không có tên
-        
-        # Đổi tên cột cho dễ xử lý
-        column_mapping = {
-            'Tt': 'STT',
-            'Họ và tên': 'HoTen',
-            'Pháp danh': 'PhapDanh', 
-            'Năm sinh': 'NamSinh',
-            'Đơn vị': 'DonVi',
-            'Điểm': 'Diem',
-            'Ghi chú': 'GhiChu'
+        if all_sources:
+            # Mỗi sheet của mỗi file là một nguồn, kết quả ghi vào thư mục con riêng
+            sources = find_sources(excel_files)
+            logger.info(f"🗂️ Chạy {len(sources)} nguồn danh sách trong một lượt")
+        else:
+            sources = [RosterSource(excel_files[0])]
+
+        # Danh sách được đọc dần từng hàng - giấy khen đầu tiên được tạo ngay
+        # khi hàng đầu tiên được đọc, không chờ đọc hết file Excel
+        source_records = {
+            source.key: metrics.timed_iter(
+                'roster_load', iter_roster(source.excel_file, config, logger, source.sheet, group_by)
+            )
+            for source in sources
         }
-        
-        # Chỉ đổi tên các cột tồn tại
-        existing_columns = {k: v for k, v in column_mapping.items() if k in df.columns}
-        df = df.rename(columns=existing_columns)
-        
-        # Kiểm tra cột filter (nếu có cấu hình)
-        filter_column = config.get('EXCEL', 'filter_column', fallback='')
-        filter_value = config.get('EXCEL', 'filter_value', fallback='')
-        
-        if filter_column and filter_value and 'GhiChu' in df.columns:
-            df_filtered = df[df['GhiChu'] == filter_value]
-            if len(df_filtered) > 0:
-                df = df_filtered
-                logger.info(f"🔍 Đã lọc theo điều kiện: {filter_column} = {filter_value}")
-        
-        total_records = len(df)
-        logger.info(f"📋 Tìm thấy {total_records} người trong danh sách")
-        
-        if total_records == 0:
-            logger.error("❌ Không có dữ liệu hợp lệ để xử lý!")
-            return
-        
-        # Hiển thị danh sách
-        print("\n📋 DANH SÁCH NGƯỜI NHẬN GIẤY KHEN:")
-        print("-" * 80)
-        print(f"{'STT':>4} | {'Họ và tên':25} | {'Pháp danh':15} | {'Năm sinh':8} | {'Đơn vị'}")
-        print("-" * 80)
-        
-        for idx, row in df.iterrows():
+        source_totals = {}
+
+        if not yes or group_by:
+            # Chạy tương tác: đọc hết danh sách để xem trước và xác nhận;
+            # gộp theo nhóm: cần biết trước mỗi nhóm có bao nhiêu người
+            for source in sources:
+                source_records[source.key] = list(source_records[source.key])
+                source_totals[source.key] = len(source_records[source.key])
+            total_records = sum(source_totals.values())
+            logger.info(f"📋 Tìm thấy {total_records} người trong danh sách")
+
+        if not yes:
+
+            if total_records == 0:
+                logger.error("❌ Không có dữ liệu hợp lệ để xử lý!")
+                return finish(EXIT_INPUT_ERROR)
+
+            # Hiển thị danh sách
+            print("\n📋 DANH SÁCH NGƯỜI NHẬN GIẤY KHEN:")
+            print("-" * 80)
+            print(f"{'STT':>4} | {'Họ và tên':25} | {'Pháp danh':15} | {'Năm sinh':8} | {'Đơn vị'}")
+            print("-" * 80)
+
+            for source in sources:
+                if len(sources) > 1:
+                    print(f"📂 {source.label} ({source_totals[source.key]} người)")
+                for record in source_records[source.key]:
+                    print(
+                        f"{record.stt:4d} | {record.ho_ten:25} | {record.phap_danh:15} | "
+                        f"{record.nam_sinh:8} | {record.don_vi}"
+                    )
+
+            print("-" * 80)
+
+            # Hỏi về việc chỉnh sửa config
+            edit_config = input(f"Bạn có muốn dừng lại để chỉnh '{config_file}'? (y/N): ").strip().lower()
+            if edit_config in ['y', 'yes']:
+                print(f"➡️ Hãy mở file '{config_file}', chỉnh xong chạy lại chương trình.")
+                return finish(EXIT_CANCELLED)
+
+            # Xác nhận tạo giấy khen
+            confirm = input(f"\n❓ Tiến hành tạo {total_records} giấy khen PDF? (y/N): ").strip().lower()
+            if confirm not in ['y', 'yes']:
+                print("❌ Đã hủy!")
+                return finish(EXIT_CANCELLED)
+
+        # Khởi tạo generator với config - dùng chung cho mọi nguồn
+        with metrics.stage('template_prepare'):
+            if session:
+                generator = session.generator(template_file, logger, config)
+            else:
+                generator = CertificateGenerator(template_file, logger, config)
+        # Engine overlay ghi thẳng ra PDF, không cần file DOCX tạm và bước chuyển PDF
+        direct_pdf = generator.outputs_pdf
+
+        skip_unchanged = config.getboolean('OUTPUT', 'skip_unchanged', fallback=True)
+        combined_name = None
+        if config.getboolean('OUTPUT', 'create_combined_pdf', fallback=True):
+            combined_name = build_combined_pdf_name(config, logger)
+        flush_every = config.getint('PERFORMANCE', 'combined_flush_every', fallback=50)
+        deduplicate = config.getboolean('OUTPUT', 'deduplicate_combined_pdf', fallback=True)
+
+        # Gộp theo nhóm: mỗi nhóm một file gộp, các nhóm được gộp song song
+        # bằng tiến trình worker ngay khi giấy khen cuối cùng của nhóm xong
+        merge_pool = None
+        if group_by and combined_name:
+            merge_jobs = resolve_workers(config.get('PERFORMANCE', 'group_merge_jobs', fallback=''), 2)
+            logger.info(f"🗂️ Gộp PDF theo cột '{group_by}' bằng {merge_jobs} tiến trình")
+            merge_pool = ProcessPoolExecutor(max_workers=merge_jobs)
+
+        # Trạng thái của từng nguồn: thư mục, manifest, file gộp và thống kê
+        runs = {}
+
+        def open_run(source):
+            run_output = output_folder / source.key if source.key else output_folder
+            run_temp = temp_folder / source.key if source.key else temp_folder
+            run_output.mkdir(parents=True, exist_ok=True)
+            if not in_memory:
+                run_temp.mkdir(parents=True, exist_ok=True)
+
+            # Bỏ qua các giấy khen đã có PDF khớp hash (cùng template, config và dữ liệu)
+            manifest = RunManifest.for_run(
+                run_output, template_file, config, generator.asset_files
+            ) if skip_unchanged else None
+
+            # File gộp được ghi dần: mỗi giấy khen xong là trang của nó được ghi ngay
+            combined_pdf = combined_writer = None
+            groups = {}
+            if merge_pool:
+                # Số người của từng nhóm - biết khi nào nhóm đã đủ để gộp
+                groups = {
+                    name: {'total': total, 'done': 0, 'files': {}, 'pdf': None, 'future': None}
+                    for name, total in Counter(record.group for record in source_records[source.key]).items()
+                }
+            elif combined_name:
+                combined_pdf = run_output / f"{combined_name}.pdf"
+                combined_writer = StreamingPdfWriter(combined_pdf, flush_every, logger, deduplicate=deduplicate)
+
+            run = {
+                'source': source,
+                'output_folder': run_output,
+                'temp_folder': run_temp,
+                'manifest': manifest,
+                'combined_pdf': combined_pdf,
+                'combined_writer': combined_writer,
+                'groups': groups,
+                'seen': 0,
+                'done': 0,
+                'exhausted': False,
+                'summary': {
+                    'roster': str(source.excel_file),
+                    'sheet': source.sheet,
+                    'output_folder': str(run_output),
+                    'total': 0,
+                    'created': 0,
+                    'unchanged': 0,
+                    'failed': [],
+                    'combined_pdf': None,
+                    'group_pdfs': {},
+                },
+            }
+            runs[source.key] = run
+            return run
+
+        def close_run(run):
+            """Hoàn tất file PDF gộp của một nguồn (các trang đã được ghi dần trong lúc xử lý)"""
+            if run['manifest']:
+                run['manifest'].save()
+            combined_writer, combined_pdf = run['combined_writer'], run['combined_pdf']
+            run['combined_writer'] = None
+            if not combined_writer:
+                return
             try:
-                stt = safe_str(row.get('STT', idx+1))
-                ho_ten = safe_str(row['HoTen'])
-                phap_danh = safe_str(row.get('PhapDanh', ''))
-                nam_sinh = safe_str(row.get('NamSinh', ''))
-                don_vi = safe_str(row.get('DonVi', ''))
-                
-                # Format an toàn cho việc hiển thị
-                stt_num = int(float(stt)) if stt else (idx + 1)
-                print(f"{stt_num:4d} | {ho_ten:25} | {phap_danh:15} | {nam_sinh:8} | {don_vi}")
-                
+                if combined_writer.page_count:
+                    prefix = f"[{run['source'].key}] " if run['source'].key else ""
+                    print(f"\n📚 {prefix}Đang hoàn tất file gộp ({combined_writer.page_count} trang)...")
+                    with metrics.stage('merge_finalize'):
+                        page_count = combined_writer.close()
+                    logger.info(f"✅ Đã gộp PDF: {combined_pdf.name} ({page_count} trang)")
+                    if combined_writer.shared_hits:
+                        logger.info(
+                            f"♻️ Dùng chung {combined_writer.shared_hits} object trùng lặp "
+                            f"(tiết kiệm {combined_writer.shared_bytes / 1024 / 1024:.1f} MB)"
+                        )
+                    print(f"📄 File gộp: {combined_pdf.relative_to(output_folder)}")
+                    run['summary']['combined_pdf'] = str(combined_pdf)
+                else:
+                    combined_writer.abort()
             except Exception as e:
-                logger.warning(f"Lỗi hiển thị dòng {idx}: {str(e)}")
-        
-        print("-" * 80)
-        
-        # Hỏi về việc chỉnh sửa config
-        edit_config = input("Bạn có muốn dừng lại để chỉnh 'config.ini'? (y/N): ").strip().lower()
-        if edit_config in ['y', 'yes']:
-            print("➡️ Hãy mở file 'config.ini', chỉnh xong chạy lại chương trình.")
-            return
-
-        # Xác nhận tạo giấy khen
-        confirm = input(f"\n❓ Tiến hành tạo {total_records} giấy khen PDF? (y/N): ").strip().lower()
-        if confirm not in ['y', 'yes']:
-            print("❌ Đã hủy!")
-            return
-
-        # Khởi tạo generator với config
-        generator = CertificateGenerator(template_file, logger, config)
+                combined_writer.abort()
+                logger.warning(f"Không thể gộp PDF: {str(e)}")
+                print(f"❌ Lỗi gộp PDF: {str(e)}")
 
-        # Thư mục tạm và output
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        temp_folder.mkdir(exist_ok=True)
+        def submit_group(run, name):
+            """Gửi nhóm đã đủ giấy khen sang tiến trình worker để gộp thành một file"""
+            group = run['groups'][name]
+            pdf_files = [str(group['files'][seq]) for seq in sorted(group['files'])]
+            group['files'] = {}
+            if not pdf_files:
+                return
+            group['pdf'] = run['output_folder'] / f"{combined_name}_{(name or 'Chua_phan_nhom').translate(FILENAME_TABLE)}.pdf"
+            prefix = f"[{run['source'].key}] " if run['source'].key else ""
+            print(f"  📚 {prefix}Đang gộp nhóm {name or '(trống)'} ({len(pdf_files)} giấy khen)...")
+            group['future'] = merge_pool.submit(merge_pdf_files, pdf_files, str(group['pdf']), flush_every, deduplicate)
 
-        pdf_files = []
-        success_count = 0
+        def collect_groups():
+            """Chờ các tiến trình gộp nhóm xong, ghi nhận file gộp của từng nhóm"""
+            for run in runs.values():
+                for name, group in run['groups'].items():
+                    if not group['future']:
+                        continue
+                    try:
+                        page_count = group['future'].result()
+                    except Exception as e:
+                        logger.warning(f"Không thể gộp PDF nhóm {name}: {str(e)}")
+                        print(f"❌ Lỗi gộp PDF nhóm {name}: {str(e)}")
+                        continue
+                    logger.info(f"✅ Đã gộp PDF nhóm {name}: {group['pdf'].name} ({page_count} trang)")
+                    print(f"📄 File gộp nhóm {name or '(trống)'}: {group['pdf'].relative_to(output_folder)}")
+                    run['summary']['group_pdfs'][name] = str(group['pdf'])
 
-        print("\n📄 Đang xử lý...")
-        print("-" * 60)
+        def prepare(run, record):
+            """Gán nguồn và đường dẫn file cho bản ghi cần render"""
+            record.source = run['source']
+            final_pdf_path = run['output_folder'] / f"{record.file_stem}.pdf"
+            # File DOCX tạm thời (hoặc PDF cuối cùng với engine ghi thẳng PDF);
+            # None = render vào bộ nhớ
+            if direct_pdf:
+                record.output_file = final_pdf_path
+            else:
+                record.output_file = None if in_memory else run['temp_folder'] / f"{record.file_stem}.docx"
+            # File PDF cuối cùng
+            record.pdf_file = final_pdf_path
+            return record
 
-        for idx, row in df.iterrows():
-            try:
-                stt_raw = row.get('STT', idx+1)
-                stt = int(float(stt_raw)) if pd.notna(stt_raw) else (idx + 1)
+        def report(record, status):
+            key = record.source.key
+            total = source_totals.get(key)
+            position = f"{record.stt:2d}/{total}" if total else f"{record.stt:2d}"
+            prefix = f"[{key}] " if key else ""
+            print(f"  {prefix}[{position}] {record.ho_ten}... {status}")
 
-                ho_ten = safe_str(row['HoTen'])
-                phap_danh = safe_str(row.get('PhapDanh', ''))
-                nam_sinh = safe_str(row.get('NamSinh', ''))
-                don_vi = safe_str(row.get('DonVi', ''))
+        # Kết quả được ghi nhận từ luồng gộp PDF và (bản ghi không đổi) từ thread đọc nguồn
+        merge_lock = threading.RLock()
 
-                safe_filename = ho_ten.replace(' ', '_').replace('/', '_').replace('\\', '_')
-                
-                # File DOCX tạm thời
-                temp_word_path = temp_folder / f"{stt:03d}_{safe_filename}.docx"
-                # File PDF cuối cùng
-                final_pdf_path = output_folder / f"{stt:03d}_{safe_filename}.pdf"
-
-                print(f"  [{stt:2d}/{total_records}] Đang xử lý: {ho_ten}... ", end='')
-
-                # Tạo DOCX tạm
-                docx_ok = generator.create_certificate(
-                    ho_ten=ho_ten,
-                    phap_danh=phap_danh,
-                    nam_sinh=nam_sinh,
-                    don_vi=don_vi,
-                    output_file=temp_word_path
-                )
+        def record_result(record, pdf_ok):
+            with merge_lock:
+                _record_result(record, pdf_ok)
 
-                if docx_ok and temp_word_path.exists():
-                    # Chuyển sang PDF
-                    pdf_ok = convert_to_pdf_safe(temp_word_path, final_pdf_path, logger)
-                    
-                    if pdf_ok and final_pdf_path.exists():
-                        pdf_files.append(final_pdf_path)
-                        success_count += 1
-                        print("✅")
+        def _record_result(record, pdf_ok):
+            run = runs[record.source.key]
+            combined_writer = run['combined_writer']
+            if pdf_ok:
+                if run['manifest']:
+                    run['manifest'].mark(record)
+            else:
+                run['summary']['failed'].append({'stt': record.stt, 'ho_ten': record.ho_ten})
+            if combined_writer:
+                try:
+                    if pdf_ok:
+                        with metrics.stage('merge', record):
+                            combined_writer.append(record.pdf_file, record.seq)
                     else:
-                        print("❌ (PDF)")
-                    
-                    # Xóa DOCX tạm thời
+                        combined_writer.skip(record.seq)
+                except Exception as e:
+                    logger.warning(f"Không thể gộp PDF: {str(e)}")
+                    print(f"❌ Lỗi gộp PDF: {str(e)}")
+                    combined_writer.abort()
+                    run['combined_writer'] = None
+            group = run['groups'].get(record.group)
+            if group is not None:
+                if pdf_ok:
+                    group['files'][record.seq] = record.pdf_file
+                group['done'] += 1
+                # Giấy khen cuối cùng của nhóm đã xong: gộp nhóm ngay, không chờ cả lượt
+                if group['done'] == group['total']:
+                    submit_group(run, record.group)
+            run['done'] += 1
+            # Nguồn đã đọc hết và mọi bản ghi đã xong: đóng file gộp ngay
+            if run['exhausted'] and run['done'] == run['seen']:
+                close_run(run)
+
+        def pending_records():
+            """Các bản ghi cần render, lần lượt từ mọi nguồn; bản ghi không thay đổi được ghi nhận ngay"""
+            for source in sources:
+                run = open_run(source)
+                for record in source_records[source.key]:
+                    prepare(run, record)
+                    run['seen'] += 1
+                    if run['manifest'] and not force and run['manifest'].is_current(record):
+                        # Dùng lại PDF cũ, vẫn đưa vào file gộp
+                        run['summary']['unchanged'] += 1
+                        record_result(record, True)
+                        report(record, "⏭️ (không đổi)")
+                        continue
+                    yield record
+                with merge_lock:
+                    run['exhausted'] = True
+                    run['summary']['total'] = run['seen']
+                    if run['done'] == run['seen']:
+                        close_run(run)
+
+        # Số tiến trình render: --jobs ưu tiên hơn [PERFORMANCE] render_jobs
+        render_jobs = resolve_workers(
+            jobs if jobs is not None else config.get('PERFORMANCE', 'render_jobs', fallback='1')
+        )
+
+        if render_jobs > 1:
+            # Mỗi tiến trình worker nạp template một lần và render từng nhóm bản ghi
+            logger.info(f"⚙️ Render song song bằng {render_jobs} tiến trình")
+            # Chế độ --watch: dùng lại pool của lượt trước, worker không phải nạp lại template
+            executor = session.render_pool(template_file, render_jobs, config, logger) if session else None
+            rendered = iter_render_parallel(
+                template_file, pending_records(), render_jobs, config, logger, executor=executor
+            )
+        else:
+            rendered = ((record, render_record(generator, record)) for record in pending_records())
+
+        converter = None
+
+        def convert_record(record):
+            source = record.docx_data if record.output_file is None else record.output_file
+            with metrics.stage('convert', record):
+                return convert_to_pdf_safe(source, record.pdf_file, logger, converter)
+
+        def convert_stage(item):
+            """Chuyển PDF cho một giấy khen đã render, xong thì dọn DOCX tạm của nó"""
+            record, docx_ok = item
+            if record.timings:
+                metrics.add('render', record.timings['render'], record)
+                metrics.add('save', record.timings['save'], record)
+            if direct_pdf:
+                return record, docx_ok and record.pdf_file.exists(), "❌ (PDF)"
+            if not (docx_ok and (record.docx_data if record.output_file is None else record.output_file.exists())):
+                return record, False, "❌ (DOCX)"
+            try:
+                pdf_ok = convert_record(record) and record.pdf_file.exists()
+            finally:
+                # Giải phóng DOCX trong bộ nhớ / xóa DOCX tạm thời
+                record.docx_data = None
+                if record.output_file is not None:
                     try:
-                        temp_word_path.unlink()
+                        record.output_file.unlink()
                     except:
                         pass
-                else:
-                    print("❌ (DOCX)")
-                    
-            except Exception as e:
-                logger.error(f"Lỗi xử lý {row.get('HoTen', 'Unknown')}: {str(e)}")
-                print("❌")
+            return record, pdf_ok, "❌ (PDF)"
+
+        def merge_stage(item):
+            """Ghi nhận kết quả và ghi trang vào file PDF gộp"""
+            record, pdf_ok, failure = item
+            report(record, "✅" if pdf_ok else failure)
+            record_result(record, pdf_ok)
+
+        try:
+            # Khởi động bộ chuyển PDF một lần cho cả lượt chạy (mọi nguồn);
+            # nằm trong try để lỗi khởi động hay lỗi cấu hình vẫn dừng được bộ chuyển
+            if session and not direct_pdf:
+                # Bộ chuyển PDF đã chạy sẵn từ lượt trước
+                converter = session.converter(config, logger)
+            elif not direct_pdf:
+                converter = create_converter(config, logger)
+                converter.start()
+
+            # Các bước chạy đồng thời, nối bằng hàng đợi có giới hạn:
+            # đọc danh sách + render (thread nguồn) → chuyển PDF (N luồng) → gộp PDF (1 luồng)
+            convert_workers = resolve_workers(
+                config.get('PERFORMANCE', 'convert_concurrency', fallback=''), getattr(converter, 'size', 1)
+            )
+            queue_size = resolve_workers(config.get('PERFORMANCE', 'pipeline_queue_size', fallback=''), convert_workers * 2)
+            logger.info(f"🔀 Pipeline: render {render_jobs} | chuyển PDF {convert_workers} | hàng đợi {queue_size}")
+
+            print("\n📄 Đang xử lý...")
+            print("-" * 60)
+
+            run_pipeline(rendered, [
+                Stage('convert', convert_stage, convert_workers),
+                # File gộp chỉ ghi được từ một luồng
+                Stage('merge', merge_stage, 1),
+            ], queue_size)
+            if merge_pool:
+                with metrics.stage('merge_finalize'):
+                    collect_groups()
+        finally:
+            if converter and not session:
+                converter.stop()
+            if merge_pool:
+                merge_pool.shutdown(wait=True, cancel_futures=True)
+            # Nguồn chưa được đóng (do lỗi giữa chừng): vẫn lưu manifest
+            for run in runs.values():
+                if run['manifest']:
+                    run['manifest'].save()
+                if run['combined_writer'] and not run['exhausted']:
+                    run['combined_writer'].abort()
+                    run['combined_writer'] = None
 
         print("-" * 60)
 
-        # Gộp PDF nếu có và được cấu hình
-        if pdf_files and config.getboolean('OUTPUT', 'create_combined_pdf', fallback=True): 
-            print(f"\n📚 Đang gộp {len(pdf_files)} file PDF...")
+        # Dọn dẹp thư mục temp
+        print("\n🧹 Dọn dẹp file tạm...")
+        with metrics.stage('cleanup'):
             try:
-                from PyPDF2 import PdfMerger
-                merger = PdfMerger()
-                for pdf in sorted(pdf_files):
-                    merger.append(str(pdf))
-        
-                # Xử lý tên file từ config - tránh lỗi % formatting
-                combined_name_template = config.get('OUTPUT', 'combined_pdf_name', 
-                                                  fallback='Chung_chi_%Y%m%d_%H%M%S')
-                # Xử lý an toàn datetime placeholder
-                try:
-                    # Escape % trong ConfigParser bằng cách dùng raw string
-                    if '%' in combined_name_template:
-                        combined_name = datetime.now().strftime(combined_name_template)
-                        logger.info(f"🕒 Sử dụng datetime template: {combined_name_template}")
+                for path in temp_folder.iterdir():
+                    if path.is_dir():
+                        shutil.rmtree(path)
                     else:
-                        # Nếu không có placeholder datetime, dùng tên gốc + timestamp
-                        combined_name = f"{combined_name_template}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                        logger.info(f"📝 Sử dụng tên tĩnh + timestamp: {combined_name}")
-                except (ValueError, TypeError) as e:
-                    # Fallback nếu template có lỗi
-                    fallback_name = f"GiayKhen_TongHop_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                    combined_name = fallback_name
-                    logger.warning(f"⚠️ Template không hợp lệ '{combined_name_template}', dùng mặc định: {fallback_name}")
-                
-                combined_pdf = output_folder / f"{combined_name}.pdf"
-                
-                merger.write(str(combined_pdf))
-                merger.close()
-                logger.info(f"✅ Đã gộp PDF: {combined_pdf.name}")
-                print(f"📄 File gộp: {combined_pdf.name}")
-                
-            except ImportError:
-                logger.info("📌 Cài đặt PyPDF2 để gộp các file PDF")
-                print("⚠️ Cần cài đặt PyPDF2: pip install PyPDF2")
-            except Exception as e:
-                logger.warning(f"Không thể gộp PDF: {str(e)}")
-                print(f"❌ Lỗi gộp PDF: {str(e)}")
+                        path.unlink()
+            except Exception:
+                pass
 
-        # Dọn dẹp thư mục temp
-        print("\n🧹 Dọn dẹp file tạm...")
-        try:
-            for file in temp_folder.glob("*"):
-                file.unlink()
-        except Exception:
-            pass
+        # Thống kê theo từng nguồn và tổng cộng
+        total_records = success_count = unchanged_count = 0
+        for run in runs.values():
+            source_summary = run['summary']
+            source_summary['created'] = (
+                source_summary['total'] - source_summary['unchanged'] - len(source_summary['failed'])
+            )
+            total_records += source_summary['total']
+            unchanged_count += source_summary['unchanged']
+            success_count += source_summary['total'] - len(source_summary['failed'])
+            for failed in source_summary['failed']:
+                run_summary['failed'].append(dict(failed, source=run['source'].key) if run['source'].key else failed)
+            if len(runs) > 1:
+                print(
+                    f"📂 {run['source'].label}: {source_summary['total'] - len(source_summary['failed'])}"
+                    f"/{source_summary['total']} file PDF"
+                )
+        if len(runs) > 1:
+            run_summary['sources'] = [run['summary'] for run in runs.values()]
+        elif runs:
+            run_summary['combined_pdf'] = next(iter(runs.values()))['summary']['combined_pdf']
+            run_summary['group_pdfs'] = next(iter(runs.values()))['summary']['group_pdfs']
+
+        run_summary['total'] = total_records
+        run_summary['unchanged'] = unchanged_count
+        run_summary['created'] = success_count - unchanged_count
+        if unchanged_count:
+            logger.info(f"⏭️ Bỏ qua {unchanged_count} giấy khen không thay đổi so với lần chạy trước")
+
+        if total_records == 0:
+            logger.error("❌ Không có dữ liệu hợp lệ để xử lý!")
+            return finish(EXIT_INPUT_ERROR)
 
         # Kết quả
         print("\n" + "=" * 60)
@@ -364,8 +778,18 @@ def main():
         print("📋 Chỉ có file PDF (không có DOCX)")
         print("=" * 60)
 
-        # Mở thư mục output
-        open_folder = input("\n🗂️ Mở thư mục kết quả? (y/N): ").strip().lower()
+        metrics.finish()
+        metrics.print_summary(run_summary['created'])
+
+        if success_count == total_records:
+            exit_code = EXIT_OK
+        elif success_count == 0:
+            exit_code = EXIT_FAILED
+        else:
+            exit_code = EXIT_PARTIAL
+
+        # Mở thư mục output (chỉ khi chạy tương tác)
+        open_folder = 'n' if yes else input("\n🗂️ Mở thư mục kết quả? (y/N): ").strip().lower()
         if open_folder in ['y', 'yes']:
             try:
                 import platform
@@ -385,9 +809,158 @@ def main():
                 print(f"⚠️ Không thể mở thư mục tự động: {str(e)}")
                 print(f"📁 Vui lòng mở thủ công: {output_folder}")
 
+        return finish(exit_code)
+
     except Exception as e:
         logger.error(f"Lỗi chính: {str(e)}")
         print(f"\n❌ Đã xảy ra lỗi: {str(e)}")
+        run_summary['error'] = str(e)
+        return finish(EXIT_FAILED)
+
+def install_sigterm_handler(handler):
+    """Đặt handler cho SIGTERM (systemd, docker stop, timeout), trả về handler cũ
+
+    Chỉ đặt được từ thread chính; ở thread khác trả về None và không làm gì.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return None
+    return signal.signal(signal.SIGTERM, handler)
+
+def restore_sigterm_handler(previous):
+    if previous is not None:
+        signal.signal(signal.SIGTERM, previous)
+
+def _interrupt_on_sigterm(signum, frame):
+    """SIGTERM được xử lý như Ctrl+C để các khối finally dừng LibreOffice và xóa profile tạm"""
+    raise KeyboardInterrupt
+
+def watch(config_file='config.ini', **options):
+    """Chế độ chạy liên tục: theo dõi thư mục input và templates, trả về mã thoát khi dừng (Ctrl+C / SIGTERM)
+
+    Template đã biên dịch, bộ chuyển PDF và process pool render (--jobs > 1)
+    được giữ sẵn giữa các lượt. Mỗi file
+    danh sách mới hoặc vừa sửa được chạy ngay (kết quả ở thư mục con riêng,
+    như --all-sources); nhờ manifest chỉ những người mới/đã sửa được tạo lại.
+    Phôi thay đổi thì biên dịch lại và chạy lại mọi danh sách.
+    options: các tham số khác của main() (template, output, engine, jobs...)
+    """
+    for option in ('roster', 'yes', 'all_sources'):
+        options.pop(option, None)
+    config = load_config(config_file)
+    logger = setup_logger("CertificateGenerator", **logging_settings(config))
+    base_dir = Path.cwd()
+    input_folder = base_dir / config.get('PATHS', 'input_folder', fallback='input')
+    template = options.get('template')
+    template_folder = Path(template).parent if template else base_dir / config.get('PATHS', 'template_folder', fallback='templates')
+    interval = max(0.2, config.getfloat('WATCH', 'interval', fallback=2.0))
+
+    create_folders([input_folder, template_folder])
+    rosters = FolderWatcher(input_folder, ('.xlsx', '.xls'))
+    # Layout có thể đặt font, ảnh nền trong thư mục con của templates
+    templates = FolderWatcher(template_folder, recursive=True, skip_existing=True)
+    session = WarmSession(create_converter, logger)
+
+    print(f"👀 Đang theo dõi '{input_folder}' và '{template_folder}' (mỗi {interval:g}s) - Ctrl+C để dừng")
+    previous_handler = install_sigterm_handler(_interrupt_on_sigterm)
+    try:
+        while True:
+            changed = rosters.poll()
+            changed_templates = templates.poll()
+            if changed_templates:
+                for path in changed_templates:
+                    logger.info(f"♻️ Phôi thay đổi: {path.name}")
+                # Mọi danh sách phải được tạo lại theo phôi mới
+                changed = rosters.files
+            for roster in changed:
+                logger.info(f"📥 Danh sách mới/đã sửa: {roster.name}")
+                exit_code = main(
+                    config_file=config_file, roster=str(roster), yes=True, all_sources=True, session=session, **options
+                )
+                logger.info(f"🏁 {roster.name}: {EXIT_STATUS[exit_code]}")
+                if exit_code == EXIT_FAILED:
+                    # Worker render có thể đã chết - lượt sau tạo pool mới
+                    session.discard_render_pool()
+            if changed:
+                print(f"\n👀 Tiếp tục theo dõi '{input_folder}'...")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n👋 Đã dừng theo dõi")
+        return EXIT_OK
+    finally:
+        session.close()
+        restore_sigterm_handler(previous_handler)
+
+def serve(config_file='config.ini', template=None, engine=None, **options):
+    """Dịch vụ HTTP tạo giấy khen đơn lẻ theo yêu cầu, trả về mã thoát khi dừng (Ctrl+C / SIGTERM)
+
+    Template được biên dịch và bộ chuyển PDF được khởi động một lần khi bắt
+    đầu; mỗi yêu cầu chỉ render một giấy khen và chuyển PDF trong bộ nhớ.
+    """
+    config = load_config(config_file)
+    logger = setup_logger("CertificateGenerator", **logging_settings(config))
+    if engine:
+        if not config.has_section('PERFORMANCE'):
+            config.add_section('PERFORMANCE')
+        config.set('PERFORMANCE', 'render_engine', engine)
+    render_engine = config.get('PERFORMANCE', 'render_engine', fallback='docx')
+    template_folder = Path.cwd() / config.get('PATHS', 'template_folder', fallback='templates')
+    template_suffix = '.json' if render_engine in LAYOUT_ENGINES else '.docx'
+    template_file = pick_file(template, template_folder, [template_suffix])
+    if template_file is None:
+        logger.error(f"❌ Không tìm thấy file phôi giấy khen ({template_suffix}): {template or template_folder}")
+        return EXIT_INPUT_ERROR
+
+    host = config.get('SERVICE', 'host', fallback='127.0.0.1').strip() or '127.0.0.1'
+    port = config.getint('SERVICE', 'port', fallback=8765)
+    converter = None
+    try:
+        generator = CertificateGenerator(template_file, logger, config)
+        if not generator.outputs_pdf:
+            converter = create_converter(config, logger)
+            converter.start()
+        service = CertificateService(generator, converter, logger)
+        if config.getboolean('SERVICE', 'warm_up', fallback=True):
+            service.warm_up()
+        server = create_server(service, host, port)
+    except Exception as e:
+        logger.error(f"❌ Không thể khởi động dịch vụ: {str(e)}")
+        if converter:
+            converter.stop()
+        return EXIT_FAILED
+
+    logger.info(f"📄 Sử dụng phôi: {template_file.name} (engine {generator.render_engine})")
+    print(f"🌐 Dịch vụ giấy khen: http://{host}:{server.server_address[1]}/certificate - Ctrl+C để dừng")
+
+    def shutdown_on_sigterm(signum, frame):
+        # serve_forever chạy ở thread chính: shutdown() phải gọi từ thread khác
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    previous_handler = install_sigterm_handler(shutdown_on_sigterm)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if converter:
+            converter.stop()
+        restore_sigterm_handler(previous_handler)
+
+    stats = service.stats()
+    request = stats['stages'].get('request')
+    if request:
+        print(
+            f"\n📊 {stats['requests']} yêu cầu | p50 {request['p50_ms']:.0f} ms | "
+            f"p95 {request['p95_ms']:.0f} ms | max {request['max_ms']:.0f} ms"
+        )
+    print("\n👋 Đã dừng dịch vụ")
+    return EXIT_OK
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = vars(parse_args())
+    watch_mode = args.pop('watch')
+    if args.pop('serve'):
+        sys.exit(serve(**args))
+    if watch_mode:
+        sys.exit(watch(**args))
+    sys.exit(main(**args))
\ No newline at end of file
@@ -0,0 +1,198 @@
+import logging
+import re
+import struct
+import time
+import zipfile
+import zlib
+from pathlib import Path
+from xml.sax.saxutils import escape, unescape
+
+from lxml import etree
+
+from src.certificate.template import (
+    PLACEHOLDER_PATTERN, is_stream, iter_text_paragraphs, output_target, substitute_placeholders
+)
+
+# Các part XML có thể chứa placeholder
+TEXT_PART_PATTERN = re.compile(r'^word/(document|header\d*|footer\d*|footnotes|endnotes|comments)\.xml$')
+# Ký tự đánh dấu placeholder trong w:t (vùng Unicode dùng riêng, không có trong văn bản thường)
+MARK_OPEN = '\ue000'
+MARK_CLOSE = '\ue001'
+# Placeholder đã đánh dấu sau khi serialize XML: << và >> bị escape thành &lt;&lt; ... &gt;&gt;
+# Chỉ placeholder trong text của w:t được đánh dấu - giá trị thuộc tính (tooltip, descr) giữ nguyên
+MARKED_PLACEHOLDER_PATTERN = re.compile(f'{MARK_OPEN}(&lt;&lt;[^{MARK_CLOSE}]+?&gt;&gt;){MARK_CLOSE}')
+
+LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+CENTRAL_HEADER = struct.Struct('<4s4B4HL2L5H2L')
+END_RECORD = struct.Struct('<4s4H2LH')
+FLAG_DATA_DESCRIPTOR = 0x08
+
+
+def normalize_placeholders(root):
+    """Dồn mỗi placeholder bị tách qua nhiều run vào w:t chứa ký tự đầu của nó
+
+    Text ngoài placeholder giữ nguyên run (và định dạng) của nó. Mọi paragraph
+    (kể cả trong textbox/shape) được xét đúng một lần. Placeholder được bọc
+    giữa MARK_OPEN và MARK_CLOSE để sau khi serialize chỉ tách đúng các
+    placeholder nằm trong text. Trả về số paragraph có placeholder.
+    """
+    count = 0
+    for _, nodes in iter_text_paragraphs(root):
+        texts = [t.text or '' for t in nodes]
+        found = PLACEHOLDER_PATTERN.findall(''.join(texts))
+        if not found:
+            continue
+        count += 1
+        substitute_placeholders(nodes, {placeholder: f'{MARK_OPEN}{placeholder}{MARK_CLOSE}' for placeholder in found}, texts)
+    return count
+
+
+class _Member:
+    """Một file trong gói .docx - giữ nguyên bytes đã nén"""
+
+    __slots__ = ('info', 'name', 'flags', 'method', 'crc', 'compress_size', 'file_size', 'data')
+
+    def __init__(self, info, data):
+        self.info = info
+        self.name = info.filename.encode('utf-8')
+        self.flags = (info.flag_bits & ~FLAG_DATA_DESCRIPTOR) | 0x800
+        self.method = info.compress_type
+        self.crc = info.CRC
+        self.compress_size = info.compress_size
+        self.file_size = info.file_size
+        self.data = data
+
+
+class _TextPart:
+    """Part XML có placeholder - lưu dưới dạng các đoạn text đã tách sẵn"""
+
+    __slots__ = ('info', 'segments', 'raw')
+
+    def __init__(self, info, segments, raw):
+        self.info = info
+        # Xen kẽ: [text, placeholder, text, placeholder, ..., text]
+        self.segments = segments
+        # Các đoạn XML gốc (đã escape, bỏ ký tự đánh dấu) - dùng lại nguyên văn cho placeholder không có giá trị thay
+        self.raw = raw
+
+
+class ZipTemplate:
+    """Engine render ở mức zip: chỉ sinh lại các part XML có placeholder
+
+    Các file còn lại (media, font, styles, theme) được chép nguyên bytes đã nén
+    từ template, không giải nén hay nén lại.
+    """
+
+    def __init__(self, template_path, logger=None, compress_level=6):
+        self.template_path = Path(template_path)
+        self.logger = logger or logging.getLogger(__name__)
+        self.compress_level = compress_level
+        self.entries = []
+        # Thời gian ghi file của lần render gần nhất (giây)
+        self.last_save_seconds = 0.0
+        self._load()
+
+    def _load(self):
+        """Đọc template một lần, tách sẵn các part có placeholder"""
+        raw = self.template_path.read_bytes()
+        with zipfile.ZipFile(self.template_path) as zf:
+            for info in zf.infolist():
+                if info.flag_bits & 0x1:
+                    raise ValueError(f"Template bị mã hóa: {info.filename}")
+
+                if TEXT_PART_PATTERN.match(info.filename):
+                    root = etree.fromstring(zf.read(info))
+                    if normalize_placeholders(root):
+                        xml = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+                        raw_segments = MARKED_PLACEHOLDER_PATTERN.split(xml.decode('utf-8'))
+                        segments = [
+                            unescape(segment) if i % 2 else segment
+                            for i, segment in enumerate(raw_segments)
+                        ]
+                        self.entries.append(_TextPart(info, segments, raw_segments))
+                        continue
+
+                # Lấy bytes đã nén trực tiếp từ local header
+                offset = info.header_offset
+                name_len, extra_len = struct.unpack('<2H', raw[offset + 26:offset + 30])
+                start = offset + LOCAL_HEADER.size + name_len + extra_len
+                self.entries.append(_Member(info, raw[start:start + info.compress_size]))
+
+    @property
+    def text_parts(self):
+        return [e.info.filename for e in self.entries if isinstance(e, _TextPart)]
+
+    def _render_part(self, part, replacements):
+        """Ghép lại XML từ các đoạn đã tách, trả về (_Member, số placeholder đã thay)"""
+        pieces = []
+        replaced = 0
+        for i, segment in enumerate(part.segments):
+            if i % 2 == 0:
+                pieces.append(segment)
+            elif segment in replacements:
+                value = replacements[segment]
+                pieces.append(escape(str(value)) if value else '')
+                replaced += 1
+            else:
+                # Placeholder lạ: giữ nguyên XML gốc (đã escape sẵn)
+                pieces.append(part.raw[i])
+        xml = ''.join(pieces).encode('utf-8')
+
+        compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED, -15)
+        data = compressor.compress(xml) + compressor.flush()
+        member = _Member(part.info, data)
+        member.method = zipfile.ZIP_DEFLATED
+        member.crc = zlib.crc32(xml)
+        member.compress_size = len(data)
+        member.file_size = len(xml)
+        return member, replaced
+
+    def render(self, replacements, output_file):
+        """Ghi file .docx (hoặc stream nhị phân) cho một giấy khen, trả về số placeholder đã thay thế"""
+        members = []
+        total_replacements = 0
+        for entry in self.entries:
+            if isinstance(entry, _TextPart):
+                member, replaced = self._render_part(entry, replacements)
+                total_replacements += replaced
+                members.append(member)
+            else:
+                members.append(entry)
+
+        target = output_target(output_file)
+        started = time.perf_counter()
+        if is_stream(target):
+            write_zip(target, members)
+        else:
+            with open(target, 'wb') as f:
+                write_zip(f, members)
+        self.last_save_seconds = time.perf_counter() - started
+        return total_replacements
+
+
+def write_zip(stream, members):
+    """Ghi các member (đã nén sẵn) ra stream theo định dạng zip"""
+    central = []
+    offset = 0
+    for m in members:
+        dostime = (m.info.date_time[3] << 11) | (m.info.date_time[4] << 5) | (m.info.date_time[5] // 2)
+        dosdate = ((m.info.date_time[0] - 1980) << 9) | (m.info.date_time[1] << 5) | m.info.date_time[2]
+        header = LOCAL_HEADER.pack(
+            b'PK\x03\x04', 20, 0, m.flags, m.method, dostime, dosdate,
+            m.crc, m.compress_size, m.file_size, len(m.name), 0
+        )
+        stream.write(header)
+        stream.write(m.name)
+        stream.write(m.data)
+        central.append(CENTRAL_HEADER.pack(
+            b'PK\x01\x02', 20, m.info.create_system, 20, 0, m.flags, m.method, dostime, dosdate,
+            m.crc, m.compress_size, m.file_size, len(m.name), 0, 0, 0,
+            m.info.internal_attr, m.info.external_attr, offset
+        ) + m.name)
+        offset += len(header) + len(m.name) + len(m.data)
+
+    central_data = b''.join(central)
+    stream.write(central_data)
+    stream.write(END_RECORD.pack(
+        b'PK\x05\x06', 0, 0, len(members), len(members), len(central_data), offset, 0
+    ))
@@ -1,10 +1,28 @@
 from pathlib import Path
 from docx import Document
+from docx.text.paragraph import Paragraph
 import logging
 from datetime import datetime
 import sys
 import time
 
+from src.certificate.template import (
+    CompiledTemplate, is_stream, iter_story_paragraphs, output_target, substitute_placeholders
+)
+from src.certificate.docx_package import ZipTemplate
+from src.certificate.parallel import iter_render_parallel
+from src.certificate.streaming import iter_pdfs
+from src.certificate.overlay import OverlayTemplate, ensure_template_pdf
+from src.certificate.layout import LayoutTemplate
+from src.converter.converters import create_converter
+from src.io.roster import Record
+
+RENDER_ENGINES = ('docx', 'zip', 'overlay', 'layout')
+# Các engine ghi thẳng ra PDF, không cần bước chuyển DOCX → PDF
+PDF_ENGINES = ('overlay', 'layout')
+# Engine dùng template là file layout (.json) thay vì file Word
+LAYOUT_ENGINES = ('layout',)
+
 class CertificateGenerator:
     """Class xử lý tạo giấy khen - hỗ trợ textbox và shapes"""
     
@@ -18,6 +36,7 @@ class CertificateGenerator:
             self.issued_at = config.get('CERTIFICATE', 'issued_at', fallback='Đà Nẵng')
             self.issued_date = config.get('CERTIFICATE', 'issued_date', fallback='').strip()
             self.no_dharma_name = config.get('CERTIFICATE', 'no_dharma_name', fallback='Không có')
+            self.render_engine = config.get('PERFORMANCE', 'render_engine', fallback='docx').strip().lower()
             self.custom_placeholders = {}
             if config.has_section('PLACEHOLDERS'):
                 for key, value in config.items('PLACEHOLDERS'):
@@ -28,10 +47,73 @@ class CertificateGenerator:
             self.issued_at = 'Đà Nẵng'
             self.issued_date = ''
             self.no_dharma_name = 'Không có'
+            self.render_engine = 'docx'
             self.custom_placeholders = {}
         
+        if self.render_engine not in RENDER_ENGINES:
+            raise ValueError(f"render_engine không hợp lệ: {self.render_engine} (chọn: {', '.join(RENDER_ENGINES)})")
+        
         if not self.template_path.exists():
             raise FileNotFoundError(f"Không tìm thấy template: {template_path}")
+        
+        self.compiled_template = None
+        self.zip_template = None
+        self.overlay_template = None
+        self.layout_template = None
+        # Kết quả của giấy khen gần nhất: engine đã dùng, số vị trí thay thế,
+        # thời gian ghi file (giây) - dùng cho log và thống kê
+        self.last_engine = None
+        self.last_replacements = 0
+        self.last_save_seconds = 0.0
+        if self.render_engine == 'overlay':
+            self.overlay_template = self._load_overlay_template()
+            if self.logger:
+                self.logger.info(f"🖌️ Engine overlay: {len(self.overlay_template.slots)} dòng có placeholder")
+            return
+        if self.render_engine == 'layout':
+            # Template là file layout JSON: nền và font nạp một lần
+            self.layout_template = LayoutTemplate(self.template_path, self.logger)
+            if self.logger:
+                self.logger.info(f"📐 Engine layout: {len(self.layout_template.fields)} dòng chữ")
+            return
+        
+        # Biên dịch template một lần cho cả lượt chạy
+        self.compiled_template = CompiledTemplate(self.template_path, self.logger)
+        if self.logger:
+            self.logger.info(f"🧩 Đã biên dịch template: {len(self.compiled_template.slots)} vị trí placeholder")
+        
+        if self.render_engine == 'zip':
+            self.zip_template = ZipTemplate(self.template_path, self.logger)
+            if self.logger:
+                self.logger.info(f"📦 Engine zip: sinh lại {', '.join(self.zip_template.text_parts)}")
+    
+    @property
+    def outputs_pdf(self):
+        """True nếu engine đang dùng ghi thẳng ra file PDF"""
+        return self.render_engine in PDF_ENGINES
+
+    @property
+    def asset_files(self):
+        """Các file ngoài template ảnh hưởng tới nội dung giấy khen (PDF template và font của overlay, font và ảnh nền của layout)"""
+        if self.overlay_template:
+            return self.overlay_template.asset_files
+        return self.layout_template.asset_files if self.layout_template else []
+    
+    def _load_overlay_template(self):
+        """Chuẩn bị template PDF cho engine overlay (chỉ chuyển PDF một lần)"""
+        config = self.config
+        template_pdf = config.get('OVERLAY', 'template_pdf', fallback='').strip() if config else ''
+        if not template_pdf:
+            template_pdf = ensure_template_pdf(
+                self.template_path, lambda: create_converter(config, self.logger), self.logger
+            )
+        return OverlayTemplate(
+            template_pdf,
+            config.get('OVERLAY', 'font_file', fallback='').strip() if config else '',
+            config.get('OVERLAY', 'bold_font_file', fallback='').strip() if config else '',
+            config.get('OVERLAY', 'align', fallback='auto').strip().lower() if config else 'auto',
+            self.logger,
+        )
     
     def check_template_placeholders(self):
         """Kiểm tra và liệt kê các placeholder trong template - PHIÊN BẢN SIÊU NÂNG CẤP"""
@@ -60,51 +142,18 @@ class CertificateGenerator:
                 
                 return find_placeholders_in_text(full_text)
             
-            # Kiểm tra trong paragraphs
-            for i, para in enumerate(doc.paragraphs):
+            # Kiểm tra mọi paragraph của mọi part (kể cả bảng, textbox/shape, header/footer)
+            counters = {}
+            for part, paragraph, _ in iter_story_paragraphs(doc):
+                partname = str(part.partname)
+                index = counters[partname] = counters.get(partname, -1) + 1
+                para = Paragraph(paragraph, part)
                 # Kiểm tra cả text thường và text từ runs
                 found_normal = find_placeholders_in_text(para.text)
-                found_runs = find_placeholders_in_paragraph_runs(para, f"Para {i}")
+                found_runs = find_placeholders_in_paragraph_runs(para, f"{partname} Para{index}")
                 placeholders_found.update(found_normal)
                 placeholders_found.update(found_runs)
             
-            # Kiểm tra trong tables - CHI TIẾT HƠN
-            for table_idx, table in enumerate(doc.tables):
-                debug_info.append(f"=== TABLE {table_idx + 1} ===")
-                for row_idx, row in enumerate(table.rows):
-                    for cell_idx, cell in enumerate(row.cells):
-                        # Log text trong cell
-                        cell_text = cell.text.strip()
-                        if cell_text and ('<<' in cell_text or '>>' in cell_text):
-                            debug_info.append(f"Cell [{row_idx},{cell_idx}]: '{cell_text}'")
-                        
-                        for para_idx, para in enumerate(cell.paragraphs):
-                            found_normal = find_placeholders_in_text(para.text)
-                            found_runs = find_placeholders_in_paragraph_runs(
-                                para, f"Table{table_idx+1} Cell[{row_idx},{cell_idx}] Para{para_idx}"
-                            )
-                            placeholders_found.update(found_normal)
-                            placeholders_found.update(found_runs)
-            
-            # Kiểm tra trong headers/footers
-            for section_idx, section in enumerate(doc.sections):
-                if section.header:
-                    for para_idx, para in enumerate(section.header.paragraphs):
-                        found_normal = find_placeholders_in_text(para.text)
-                        found_runs = find_placeholders_in_paragraph_runs(
-                            para, f"Header{section_idx} Para{para_idx}"
-                        )
-                        placeholders_found.update(found_normal)
-                        placeholders_found.update(found_runs)
-                if section.footer:
-                    for para_idx, para in enumerate(section.footer.paragraphs):
-                        found_normal = find_placeholders_in_text(para.text)
-                        found_runs = find_placeholders_in_paragraph_runs(
-                            para, f"Footer{section_idx} Para{para_idx}"
-                        )
-                        placeholders_found.update(found_normal)
-                        placeholders_found.update(found_runs)
-            
             if self.logger:
                 if placeholders_found:
                     self.logger.info("📋 Placeholders tìm thấy trong template:")
@@ -126,7 +175,11 @@ class CertificateGenerator:
             return []
 
     def create_certificate(self, ho_ten, phap_danh="", nam_sinh="", don_vi="", output_file=None):
-        """Tạo giấy khen - Ưu tiên python-docx như phiên bản cũ"""
+        """Tạo giấy khen - Ưu tiên python-docx như phiên bản cũ
+
+        output_file là đường dẫn file hoặc stream nhị phân (io.BytesIO) để
+        render thẳng vào bộ nhớ (không dùng được với engine overlay và Word COM).
+        """
         try:
             # Xử lý dữ liệu
             phap_danh_display = phap_danh.strip() if phap_danh.strip() else self.no_dharma_name
@@ -136,8 +189,13 @@ class CertificateGenerator:
             else:
                 current_date = datetime.now().strftime("ngày %d tháng %m năm %Y")
             
-            if self.logger:
-                self.logger.info(f"🔄 Đang xử lý: {ho_ten}")
+            started = time.perf_counter()
+            debug = self.logger is not None and self.logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                self.logger.debug(f"🔄 Đang xử lý: {ho_ten}")
+            self.last_engine = None
+            self.last_replacements = 0
+            self.last_save_seconds = 0.0
             
             # Tạo mapping với format ĐÚNG như trong Word template
             replacements = {
@@ -154,24 +212,40 @@ class CertificateGenerator:
             for key, value in self.custom_placeholders.items():
                 replacements[key] = value
             
-            if self.logger:
+            if debug:
                 self.logger.debug("📄 Mapping sẽ sử dụng:")
                 for k, v in replacements.items():
                     self.logger.debug(f"  {k} → {v}")
             
-            # Kiểm tra template trước khi xử lý
-            template_placeholders = self.check_template_placeholders()
-            
-            # Ưu tiên dùng python-docx như phiên bản cũ đã hoạt động
-            success = self._use_python_docx_advanced_v2(replacements, output_file)
+            # Engine overlay/layout ghi thẳng ra PDF, không dùng chung dự phòng với các engine DOCX
+            success = False
+            if self.overlay_template:
+                success = self._use_overlay_engine(replacements, output_file)
+                self._log_result(ho_ten, output_file, success, started)
+                return success
+            if self.layout_template:
+                success = self._use_layout_engine(replacements, output_file)
+                self._log_result(ho_ten, output_file, success, started)
+                return success
+            
+            # Engine zip (nếu bật) → template biên dịch → python-docx v2 làm dự phòng khi engine trước bị lỗi
+            if self.zip_template:
+                success = self._use_zip_engine(replacements, output_file)
+            if not success:
+                success = self._use_compiled_template(replacements, output_file)
+            if not success:
+                success = self._use_python_docx_advanced_v2(replacements, output_file)
             
             # Nếu python-docx thất bại và trên Windows, thử Word COM
-            if not success and sys.platform == "win32":
+            if not success and sys.platform == "win32" and not is_stream(output_file):
                 if self.logger:
                     self.logger.warning("⚠️ python-docx thất bại, thử Word COM...")
                 time.sleep(0.5)
                 success = self._use_word_com_simple(replacements, output_file)
+                if success:
+                    self.last_engine = 'word-com'
             
+            self._log_result(ho_ten, output_file, success, started)
             return success
                 
         except Exception as e:
@@ -179,176 +253,117 @@ class CertificateGenerator:
                 self.logger.error(f"❌ Lỗi tạo giấy khen cho {ho_ten}: {str(e)}")
             return False
 
-    def _use_python_docx_advanced_v2(self, replacements, output_file):
-        """Sử dụng python-docx với xử lý run-level cải tiến - PHIÊN BẢN 2"""
+    def _log_result(self, ho_ten, output_file, success, started):
+        """Một dòng log cho mỗi giấy khen thành công (chi tiết từng bước ở mức DEBUG)"""
+        if self.logger and success:
+            self.logger.info(
+                f"✅ {ho_ten} | engine={self.last_engine} | {self.last_replacements} vị trí | "
+                f"{(time.perf_counter() - started) * 1000:.1f} ms | {self._output_name(output_file)}"
+            )
+
+    @staticmethod
+    def _output_name(output_file):
+        return '(bộ nhớ)' if is_stream(output_file) else Path(output_file).name
+
+    def _use_compiled_template(self, replacements, output_file):
+        """Render bằng template đã biên dịch - không đọc lại file .docx"""
+        if not output_file:
+            return False
+        try:
+            total_replacements = self.compiled_template.render(replacements, output_file)
+            self.last_save_seconds = self.compiled_template.last_save_seconds
+            self.last_engine, self.last_replacements = 'docx', total_replacements
+            if self.logger:
+                self.logger.debug(f"✅ Tạo thành công (template biên dịch, {total_replacements} vị trí): {self._output_name(output_file)}")
+            # Render xong là kết quả cuối cùng (0 vị trí là hợp lệ: template không có placeholder)
+            return True
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"❌ Lỗi render template biên dịch: {e}")
+            return False
+
+    def _use_zip_engine(self, replacements, output_file):
+        """Render ở mức zip - chỉ sinh lại document/header/footer XML"""
+        if not output_file:
+            return False
+        try:
+            total_replacements = self.zip_template.render(replacements, output_file)
+            self.last_save_seconds = self.zip_template.last_save_seconds
+            self.last_engine, self.last_replacements = 'zip', total_replacements
+            if self.logger:
+                self.logger.debug(f"✅ Tạo thành công (engine zip, {total_replacements} vị trí): {self._output_name(output_file)}")
+            # Render xong là kết quả cuối cùng (0 vị trí là hợp lệ: template không có placeholder)
+            return True
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"❌ Lỗi engine zip: {e}")
+            return False
+
+    def _use_overlay_engine(self, replacements, output_file):
+        """Vẽ text lên bản sao PDF template - không cần Word/LibreOffice"""
+        if not output_file:
+            return False
+        try:
+            total_replacements = self.overlay_template.render(replacements, output_file)
+            self.last_save_seconds = self.overlay_template.last_save_seconds
+            self.last_engine, self.last_replacements = 'overlay', total_replacements
+            if self.logger:
+                self.logger.debug(f"✅ Tạo thành công (engine overlay, {total_replacements} vị trí): {self._output_name(output_file)}")
+            return total_replacements > 0
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"❌ Lỗi engine overlay: {e}")
+            return False
+
+    def _use_layout_engine(self, replacements, output_file):
+        """Vẽ giấy khen từ file layout thẳng ra PDF - không cần Word/LibreOffice"""
+        if not output_file or is_stream(output_file):
+            return False
         try:
+            total_replacements = self.layout_template.render(replacements, output_file)
+            self.last_save_seconds = self.layout_template.last_save_seconds
+            self.last_engine, self.last_replacements = 'layout', total_replacements
             if self.logger:
-                self.logger.info("🔧 Đang sử dụng python-docx (v2)...")
+                self.logger.debug(f"✅ Tạo thành công (engine layout, {total_replacements} vị trí): {self._output_name(output_file)}")
+            return total_replacements > 0
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"❌ Lỗi engine layout: {e}")
+            return False
+
+    def _use_python_docx_advanced_v2(self, replacements, output_file):
+        """Sử dụng python-docx, thay placeholder ở mức run (giữ định dạng) - PHIÊN BẢN 2"""
+        try:
+            # Chỉ dựng chuỗi log chi tiết khi bật mức DEBUG
+            debug = self.logger is not None and self.logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                self.logger.debug("🔧 Đang sử dụng python-docx (v2)...")
             
             # Đọc template
             doc = Document(str(self.template_path))
             total_replacements = 0
             
-            def replace_in_paragraph_v2(paragraph):
-                """Thay thế placeholder trong paragraph - THUẬT TOÁN MỚI"""
-                if not paragraph.runs:
-                    return False
-                
-                # Bước 1: Ghép tất cả text lại và tìm placeholder
-                full_text = ''.join(run.text for run in paragraph.runs)
-                
-                # Kiểm tra có placeholder không
-                has_placeholder = False
-                new_text = full_text
-                for placeholder, replacement in replacements.items():
-                    if placeholder in new_text:
-                        new_text = new_text.replace(placeholder, str(replacement) if replacement else '')
-                        has_placeholder = True
-                        if self.logger:
-                            self.logger.debug(f"   Found & Replaced: {placeholder} → {replacement}")
-                
-                # Nếu không có placeholder, không làm gì
-                if not has_placeholder:
-                    return False
-                
-                # Bước 2: Lưu format của run đầu tiên (hoặc run có text)
-                first_run_with_text = None
-                for run in paragraph.runs:
-                    if run.text.strip():
-                        first_run_with_text = run
-                        break
-                
-                if not first_run_with_text:
-                    first_run_with_text = paragraph.runs[0]
-                
-                # Lưu format
-                original_format = {
-                    'bold': first_run_with_text.bold,
-                    'italic': first_run_with_text.italic,
-                    'underline': first_run_with_text.underline,
-                }
-                
-                # Lưu font nếu có
-                try:
-                    original_format['font_name'] = first_run_with_text.font.name
-                    original_format['font_size'] = first_run_with_text.font.size
-                    original_format['font_color'] = first_run_with_text.font.color.rgb
-                except:
-                    pass
-                
-                # Bước 3: Xóa tất cả runs cũ
-                paragraph.clear()
-                
-                # Bước 4: Tạo run mới với text đã thay thế
-                new_run = paragraph.add_run(new_text)
-                
-                # Bước 5: Áp dụng lại format
-                try:
-                    if original_format.get('bold') is not None:
-                        new_run.bold = original_format['bold']
-                    if original_format.get('italic') is not None:
-                        new_run.italic = original_format['italic']
-                    if original_format.get('underline') is not None:
-                        new_run.underline = original_format['underline']
-                    if original_format.get('font_name'):
-                        new_run.font.name = original_format['font_name']
-                    if original_format.get('font_size'):
-                        new_run.font.size = original_format['font_size']
-                    if original_format.get('font_color'):
-                        new_run.font.color.rgb = original_format['font_color']
-                except Exception as e:
-                    if self.logger:
-                        self.logger.debug(f"Không thể áp dụng format: {e}")
-                
-                return True
-            
-            # Xử lý tất cả paragraphs
-            for para in doc.paragraphs:
-                if replace_in_paragraph_v2(para):
-                    total_replacements += 1
-            
-            # Xử lý trong tables - CẢI TIẾN ĐẶC BIỆT CHO TABLE
-            for table_idx, table in enumerate(doc.tables):
-                if self.logger:
-                    self.logger.debug(f"Đang xử lý table {table_idx + 1}...")
-                
-                for row_idx, row in enumerate(table.rows):
-                    for cell_idx, cell in enumerate(row.cells):
-                        # Xử lý từng paragraph trong cell
-                        for para_idx, para in enumerate(cell.paragraphs):
-                            # Debug: hiển thị text trong cell
-                            if para.text.strip() and '<<' in para.text:
-                                if self.logger:
-                                    self.logger.debug(f"  Cell [{row_idx},{cell_idx}] para {para_idx}: '{para.text}'")
-                            
-                            if replace_in_paragraph_v2(para):
-                                total_replacements += 1
-                                if self.logger:
-                                    self.logger.debug(f"  ✅ Replaced in table cell [{row_idx},{cell_idx}]")
-                        
-                        # Thêm: Xử lý trực tiếp text trong cell (backup method)
-                        try:
-                            cell_text = cell.text
-                            if any(placeholder in cell_text for placeholder in replacements.keys()):
-                                if self.logger:
-                                    self.logger.debug(f"  🔄 Trying direct cell text replacement...")
-                                # Thử thay thế trực tiếp trong cell text (ít hiệu quả nhưng có thể work)
-                                new_cell_text = cell_text
-                                for placeholder, replacement in replacements.items():
-                                    if placeholder in new_cell_text:
-                                        new_cell_text = new_cell_text.replace(placeholder, str(replacement) if replacement else '')
-                                
-                                # Nếu có thay đổi, clear cell và add lại
-                                if new_cell_text != cell_text:
-                                    # Clear tất cả paragraphs trong cell
-                                    for para in cell.paragraphs[::-1]:  # Reverse để tránh index issues
-                                        if len(cell.paragraphs) > 1:
-                                            cell._element.remove(para._element)
-                                    
-                                    # Add text mới vào paragraph đầu tiên
-                                    if cell.paragraphs:
-                                        cell.paragraphs[0].clear()
-                                        cell.paragraphs[0].add_run(new_cell_text)
-                                    else:
-                                        # Tạo paragraph mới nếu cần
-                                        new_para = cell.add_paragraph()
-                                        new_para.add_run(new_cell_text)
-                                    
-                                    total_replacements += 1
-                                    if self.logger:
-                                        self.logger.debug(f"  ✅ Direct cell replacement successful")
-                        except Exception as e:
-                            if self.logger:
-                                self.logger.debug(f"  ⚠️ Direct cell replacement failed: {e}")
-            
-            # Xử lý headers và footers
-            for section in doc.sections:
-                # Header
-                if section.header:
-                    for para in section.header.paragraphs:
-                        if replace_in_paragraph_v2(para):
-                            total_replacements += 1
-                
-                # Footer
-                if section.footer:
-                    for para in section.footer.paragraphs:
-                        if replace_in_paragraph_v2(para):
-                            total_replacements += 1
+            # Xử lý mọi paragraph của mọi part (thân văn bản, bảng, textbox/shape,
+            # header/footer) - mỗi paragraph đúng một lần, kể cả ô gộp. Text được quét
+            # một lượt, chỉ các run chồng lên placeholder bị sửa (giữ nguyên định dạng)
+            for part, paragraph, nodes in iter_story_paragraphs(doc):
+                replaced = substitute_placeholders(nodes, replacements)
+                if replaced:
+                    total_replacements += replaced
+                    if debug:
+                        self.logger.debug(f"   Found & Replaced: {replaced} placeholder trong {part.partname}")
             
-            if self.logger:
-                self.logger.info(f"📊 python-docx v2 - Tổng thay thế: {total_replacements} vị trí")
+            if debug:
+                self.logger.debug(f"📊 python-docx v2 - Tổng thay thế: {total_replacements} vị trí")
             
             # Lưu file
             if output_file:
-                # Đảm bảo thư mục tồn tại
-                output_file = Path(output_file)
-                output_file.parent.mkdir(parents=True, exist_ok=True)
-                
-                # Lưu document
-                doc.save(str(output_file))
+                # Lưu document (đường dẫn: tạo sẵn thư mục; stream: ghi thẳng vào bộ nhớ)
+                doc.save(output_target(output_file))
                 
-                if self.logger:
-                    self.logger.info(f"✅ Tạo thành công bằng python-docx v2: {output_file.name}")
+                self.last_engine, self.last_replacements = 'docx-v2', total_replacements
+                if debug:
+                    self.logger.debug(f"✅ Tạo thành công bằng python-docx v2: {self._output_name(output_file)}")
                 
                 return True if total_replacements > 0 else False
             
@@ -590,13 +605,31 @@ class CertificateGenerator:
             # Đợi một chút để Word giải phóng file
             time.sleep(0.5)
 
-    def batch_create(self, data_list, output_folder):
-        """Tạo nhiều giấy khen cùng lúc"""
+    def batch_create(self, data_list, output_folder, jobs=1):
+        """Tạo nhiều giấy khen cùng lúc - jobs > 1 dùng nhiều tiến trình song song"""
         output_folder = Path(output_folder)
         output_folder.mkdir(parents=True, exist_ok=True)
         
         success_count = 0
         failed_list = []
+        suffix = '.pdf' if self.outputs_pdf else '.docx'
+        
+        if jobs > 1:
+            records = []
+            for idx, data in enumerate(data_list, 1):
+                record = Record(
+                    idx - 1, idx, data.get('ho_ten', ''), data.get('phap_danh', ''),
+                    data.get('nam_sinh', ''), data.get('don_vi', '')
+                )
+                record.output_file = output_folder / f"{record.file_stem}{suffix}"
+                records.append(record)
+            
+            for record, ok in iter_render_parallel(self.template_path, records, jobs, self.config, self.logger):
+                if ok:
+                    success_count += 1
+                else:
+                    failed_list.append(record.ho_ten or f'Record {record.stt}')
+            return success_count, failed_list
         
         for idx, data in enumerate(data_list, 1):
             try:
@@ -606,7 +639,7 @@ class CertificateGenerator:
                 don_vi = data.get('don_vi', '')
                 
                 safe_name = ho_ten.replace(' ', '_').replace('/', '_').replace('\\', '_')
-                output_file = output_folder / f"{idx:03d}_{safe_name}.docx"
+                output_file = output_folder / f"{idx:03d}_{safe_name}{suffix}"
                 
                 if self.create_certificate(ho_ten, phap_danh, nam_sinh, don_vi, output_file):
                     success_count += 1
@@ -618,4 +651,18 @@ class CertificateGenerator:
                 if self.logger:
                     self.logger.error(f"❌ Lỗi xử lý {data.get('ho_ten', '')}: {str(e)}")
         
-        return success_count, failed_list
\ No newline at end of file
+        return success_count, failed_list
+
+    def iter_pdfs(self, records, converter=None, ordered=True, max_in_flight=None, workers=None):
+        """Tạo giấy khen dạng stream, yield (record, pdf_bytes) hoặc (record, Exception)
+
+        Không ghi file ra thư mục, không cần có đủ danh sách từ đầu; xem
+        src.certificate.streaming.iter_pdfs cho ý nghĩa các tham số. Ví dụ ghi
+        thẳng vào file zip:
+
+            with zipfile.ZipFile('giaykhen.zip', 'w') as archive:
+                for record, result in generator.iter_pdfs(records):
+                    if not isinstance(result, Exception):
+                        archive.writestr(f"{record.file_stem}.pdf", result)
+        """
+        return iter_pdfs(self, records, converter, ordered, max_in_flight, workers)
@@ -0,0 +1,198 @@
+import json
+import logging
+import time
+from pathlib import Path
+
+from src.certificate.overlay import _import_pymupdf
+from src.certificate.template import PLACEHOLDER_PATTERN
+
+LAYOUT_ALIGNMENTS = ('left', 'center', 'right')
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff')
+DEFAULT_FONT = 'regular'
+
+
+def parse_color(value):
+    """Màu '#RRGGBB' hoặc [r, g, b] (0-255) → bộ ba 0..1 của PyMuPDF"""
+    if value is None:
+        return (0, 0, 0)
+    if isinstance(value, str):
+        value = value.strip().lstrip('#')
+        if len(value) != 6:
+            raise ValueError(f"Màu không hợp lệ: #{value} (dùng dạng #RRGGBB)")
+        value = [int(value[i:i + 2], 16) for i in (0, 2, 4)]
+    if len(value) != 3:
+        raise ValueError(f"Màu không hợp lệ: {value}")
+    return tuple(channel / 255 for channel in value)
+
+
+class LayoutField:
+    """Một dòng chữ đặt tại vị trí cố định trên trang"""
+
+    __slots__ = ('page', 'text', 'x', 'y', 'font', 'size', 'color', 'align', 'max_width')
+
+    def __init__(self, page, text, x, y, font, size, color, align, max_width):
+        self.page = page
+        self.text = text
+        # x: mép trái / tâm / mép phải tùy align; y: đường chân chữ, tính từ mép trên (pt)
+        self.x = x
+        self.y = y
+        self.font = font
+        self.size = size
+        self.color = color
+        self.align = align
+        self.max_width = max_width
+
+
+class LayoutTemplate:
+    """Engine layout: giấy khen mô tả bằng file JSON, vẽ thẳng ra PDF
+
+    File layout khai báo khổ trang, ảnh nền (ảnh hoặc PDF), các file font và
+    các dòng chữ có placeholder (<<Ho_va_ten>>, <<Phap_danh>>...) cùng vị trí,
+    cỡ chữ, màu, căn lề. Không cần Word/LibreOffice. Ảnh nền và font chỉ nạp
+    một lần; mỗi giấy khen chỉ mở bản PDF nền trong bộ nhớ và vẽ chữ lên.
+
+    Ví dụ:
+        {
+          "page": "A4-L",
+          "background": "nen.png",
+          "fonts": {"regular": "fonts/times.ttf", "bold": "fonts/timesbd.ttf"},
+          "fields": [
+            {"text": "<<Ho_va_ten>>", "x": 421, "y": 260, "font": "bold", "size": 28,
+             "color": "#B00000", "align": "center", "max_width": 600}
+          ]
+        }
+
+    Đường dẫn tương đối tính từ thư mục chứa file layout; tọa độ tính bằng point.
+    """
+
+    def __init__(self, layout_file, logger=None):
+        self.pymupdf = _import_pymupdf()
+        self.layout_file = Path(layout_file)
+        self.logger = logger or logging.getLogger(__name__)
+        try:
+            spec = json.loads(self.layout_file.read_text(encoding='utf-8'))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"File layout không hợp lệ ({self.layout_file.name}): {e}")
+        base_dir = self.layout_file.parent
+        # Các file layout tham chiếu tới (font, ảnh nền) - đổi file thì phải tạo lại giấy khen
+        self.asset_files = [base_dir / path for path in (spec.get('fonts') or {}).values()]
+        if spec.get('background'):
+            self.asset_files.append(base_dir / spec['background'])
+
+        fonts = spec.get('fonts') or {}
+        if DEFAULT_FONT not in fonts:
+            raise ValueError(f"File layout cần font '{DEFAULT_FONT}' trong mục fonts")
+        # Font chỉ nạp một lần cho cả lượt chạy
+        self.fonts = {name: self.pymupdf.Font(fontbuffer=(base_dir / path).read_bytes()) for name, path in fonts.items()}
+
+        self.fields = []
+        for i, field in enumerate(spec.get('fields') or []):
+            if 'text' not in field or 'x' not in field or 'y' not in field:
+                raise ValueError(f"Dòng chữ thứ {i + 1} trong layout cần text, x và y")
+            align = field.get('align', 'left')
+            if align not in LAYOUT_ALIGNMENTS:
+                raise ValueError(f"align không hợp lệ: {align} (chọn: {', '.join(LAYOUT_ALIGNMENTS)})")
+            font = field.get('font', DEFAULT_FONT)
+            if font not in self.fonts:
+                raise ValueError(f"Font '{font}' chưa được khai báo trong mục fonts của layout")
+            self.fields.append(LayoutField(
+                int(field.get('page', 0)), field['text'], float(field['x']), float(field['y']), font,
+                float(field.get('size', 12)), parse_color(field.get('color')), align,
+                float(field['max_width']) if field.get('max_width') else None,
+            ))
+        if not self.fields:
+            raise ValueError("File layout không có dòng chữ nào (mục fields)")
+
+        self.base_pdf = self._build_base(spec, base_dir)
+        # Thời gian ghi file của lần render gần nhất (giây)
+        self.last_save_seconds = 0.0
+
+    def _page_size(self, page):
+        if isinstance(page, str):
+            return self.pymupdf.paper_size(page.lower())
+        return float(page['width']), float(page['height'])
+
+    def _build_base(self, spec, base_dir):
+        """Dựng PDF nền (khổ trang + ảnh nền) một lần, giữ dạng bytes trong bộ nhớ"""
+        pymupdf = self.pymupdf
+        background = spec.get('background')
+        background = base_dir / background if background else None
+
+        if background and background.suffix.lower() == '.pdf':
+            # Nền PDF: khổ trang lấy theo file nền
+            doc = pymupdf.open(str(background))
+        else:
+            width, height = self._page_size(spec.get('page', 'A4-L'))
+            if width <= 0 or height <= 0:
+                raise ValueError(f"Khổ trang không hợp lệ: {spec.get('page')}")
+            doc = pymupdf.open()
+            pages = max(field.page for field in self.fields) + 1
+            for _ in range(pages):
+                page = doc.new_page(width=width, height=height)
+                if background:
+                    if background.suffix.lower() not in IMAGE_SUFFIXES:
+                        raise ValueError(f"Ảnh nền không hỗ trợ: {background.name}")
+                    page.insert_image(page.rect, filename=str(background), keep_proportion=False)
+        try:
+            if max(field.page for field in self.fields) >= doc.page_count:
+                raise ValueError(f"Layout có dòng chữ ở trang không tồn tại (nền chỉ có {doc.page_count} trang)")
+            return doc.tobytes(garbage=3, deflate=True)
+        finally:
+            doc.close()
+
+    @property
+    def placeholders(self):
+        found = set()
+        for field in self.fields:
+            found.update(PLACEHOLDER_PATTERN.findall(field.text))
+        return sorted(found)
+
+    def render(self, replacements, output_file):
+        """Ghi file PDF cho một giấy khen, trả về số placeholder đã thay thế"""
+        total_replacements = 0
+
+        def substitute(match):
+            nonlocal total_replacements
+            placeholder = match.group(0)
+            if placeholder not in replacements:
+                return placeholder
+            total_replacements += 1
+            value = replacements[placeholder]
+            return str(value) if value else ''
+
+        doc = self.pymupdf.open('pdf', self.base_pdf)
+        try:
+            for field in self.fields:
+                page = doc[field.page]
+                text = PLACEHOLDER_PATTERN.sub(substitute, field.text)
+                if not text.strip():
+                    continue
+
+                # Thu nhỏ chữ nếu dòng dài hơn max_width
+                font = self.fonts[field.font]
+                fontsize = field.size
+                width = font.text_length(text, fontsize)
+                if field.max_width and width > field.max_width:
+                    fontsize = fontsize * field.max_width / width
+                    width = field.max_width
+
+                if field.align == 'center':
+                    x = field.x - width / 2
+                elif field.align == 'right':
+                    x = field.x - width
+                else:
+                    x = field.x
+                # TextWriter dùng Font đã nạp sẵn (không đo lại độ rộng mọi glyph như page.insert_text)
+                writer = self.pymupdf.TextWriter(page.rect)
+                writer.append((x, field.y), text, font=font, fontsize=fontsize)
+                writer.write_text(page, color=field.color)
+
+            output_file = Path(output_file)
+            output_file.parent.mkdir(parents=True, exist_ok=True)
+            started = time.perf_counter()
+            doc.subset_fonts()
+            doc.save(str(output_file), garbage=1, deflate=True)
+            self.last_save_seconds = time.perf_counter() - started
+        finally:
+            doc.close()
+        return total_replacements
@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from src.certificate.template import PLACEHOLDER_PATTERN, output_target
+
+ALIGNMENTS = ('auto', 'left', 'center')
+# Dòng được coi là căn giữa nếu tâm lệch khỏi tâm trang không quá tỉ lệ này
+CENTER_TOLERANCE = 0.03
+FLAG_BOLD = 16
+
+
+def _import_pymupdf():
+    try:
+        import pymupdf
+    except ImportError:
+        import fitz as pymupdf
+    return pymupdf
+
+
+def ensure_template_pdf(template_path, converter_factory, logger=None):
+    """Chuyển template DOCX sang PDF một lần, lưu cache theo nội dung template
+
+    converter_factory() trả về bộ chuyển PDF (có start/convert/stop). Các lần
+    chạy sau (và các tiến trình worker) dùng lại file PDF trong cache.
+    """
+    template_path = Path(template_path)
+    digest = hashlib.sha1(template_path.read_bytes()).hexdigest()[:16]
+    cache_dir = Path(tempfile.gettempdir()) / 'certifynow_overlay'
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cached = cache_dir / f"{template_path.stem}_{digest}.pdf"
+    if cached.exists():
+        return cached
+
+    if logger:
+        logger.info(f"🖨️ Chuyển template sang PDF một lần: {template_path.name}")
+    partial = cache_dir / f"{cached.stem}.{os.getpid()}.tmp.pdf"
+    converter = converter_factory()
+    converter.start()
+    try:
+        ok = converter.convert(template_path, partial)
+        if ok is False or not partial.exists() or partial.stat().st_size == 0:
+            raise RuntimeError(f"Không chuyển được template sang PDF: {template_path.name}")
+    except BaseException:
+        # Không để lại file dở dang trong cache
+        try:
+            partial.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+    finally:
+        converter.stop()
+    # Đổi tên nguyên tử để các tiến trình khác không đọc phải file dở dang
+    os.replace(partial, cached)
+    return cached
+
+
+class OverlaySlot:
+    """Một dòng text trong PDF template có chứa placeholder"""
+
+    __slots__ = ('page', 'text', 'x0', 'x1', 'baseline', 'fontsize', 'color', 'bold', 'align')
+
+    def __init__(self, page, text, x0, x1, baseline, fontsize, color, bold, align):
+        self.page = page
+        self.text = text
+        self.x0 = x0
+        self.x1 = x1
+        self.baseline = baseline
+        self.fontsize = fontsize
+        self.color = color
+        self.bold = bold
+        self.align = align
+
+
+class OverlayTemplate:
+    """Engine overlay: vẽ text của từng người lên bản sao PDF template
+
+    Template PDF được phân tích một lần: mỗi dòng có placeholder được ghi lại vị
+    trí, cỡ chữ, màu, rồi bị xóa khỏi trang (giữ nguyên ảnh nền và hình vẽ).
+    Mỗi giấy khen chỉ cần mở bản PDF đã xóa và vẽ lại các dòng đó với dữ liệu
+    thật - không cần Word/LibreOffice. Mỗi dòng dùng một font duy nhất.
+    """
+
+    def __init__(self, template_pdf, font_file, bold_font_file='', align='auto', logger=None):
+        self.pymupdf = _import_pymupdf()
+        self.template_pdf = Path(template_pdf)
+        self.logger = logger or logging.getLogger(__name__)
+        if align not in ALIGNMENTS:
+            raise ValueError(f"align không hợp lệ: {align} (chọn: {', '.join(ALIGNMENTS)})")
+        if not font_file:
+            raise ValueError("Engine overlay cần font_file trong mục [OVERLAY] của config.ini")
+        # Các file quyết định nội dung giấy khen ngoài template .docx - đổi file thì phải tạo lại
+        self.asset_files = [self.template_pdf, Path(font_file)] + ([Path(bold_font_file)] if bold_font_file else [])
+
+        # Font chỉ nạp một lần cho cả lượt chạy
+        self.font_buffer = Path(font_file).read_bytes()
+        self.bold_font_buffer = Path(bold_font_file).read_bytes() if bold_font_file else self.font_buffer
+        self.font = self.pymupdf.Font(fontbuffer=self.font_buffer)
+        self.bold_font = self.pymupdf.Font(fontbuffer=self.bold_font_buffer)
+
+        self.slots = []
+        self.blank_pdf = None
+        # Thời gian ghi file của lần render gần nhất (giây)
+        self.last_save_seconds = 0.0
+        self._compile(align)
+
+    def _compile(self, align):
+        pymupdf = self.pymupdf
+        doc = pymupdf.open(str(self.template_pdf))
+        try:
+            for page_no, page in enumerate(doc):
+                page_center = page.rect.width / 2
+                for block in page.get_text('dict')['blocks']:
+                    for line in block.get('lines', []):
+                        spans = line['spans']
+                        text = ''.join(span['text'] for span in spans)
+                        if not PLACEHOLDER_PATTERN.search(text):
+                            continue
+
+                        # Lấy kiểu chữ của span chứa placeholder đầu tiên
+                        style = next((s for s in spans if '<<' in s['text']), spans[0])
+                        x0, y0, x1, y1 = line['bbox']
+                        slot_align = align
+                        if slot_align == 'auto':
+                            offset = abs((x0 + x1) / 2 - page_center)
+                            slot_align = 'center' if offset <= page.rect.width * CENTER_TOLERANCE else 'left'
+
+                        color = style['color']
+                        self.slots.append(OverlaySlot(
+                            page_no, text.strip(), x0, x1, spans[0]['origin'][1], style['size'],
+                            ((color >> 16 & 255) / 255, (color >> 8 & 255) / 255, (color & 255) / 255),
+                            bool(style['flags'] & FLAG_BOLD), slot_align,
+                        ))
+                        page.add_redact_annot(pymupdf.Rect(x0, y0, x1, y1))
+                page.apply_redactions(
+                    images=pymupdf.PDF_REDACT_IMAGE_NONE,
+                    graphics=pymupdf.PDF_REDACT_LINE_ART_NONE,
+                )
+            self.blank_pdf = doc.tobytes(garbage=3, deflate=True)
+        finally:
+            doc.close()
+
+    @property
+    def placeholders(self):
+        found = set()
+        for slot in self.slots:
+            found.update(PLACEHOLDER_PATTERN.findall(slot.text))
+        return sorted(found)
+
+    def render(self, replacements, output_file):
+        """Ghi file PDF (hoặc stream nhị phân) cho một giấy khen, trả về số placeholder đã thay thế"""
+        total_replacements = 0
+
+        def substitute(match):
+            nonlocal total_replacements
+            placeholder = match.group(0)
+            if placeholder not in replacements:
+                return placeholder
+            total_replacements += 1
+            value = replacements[placeholder]
+            return str(value) if value else ''
+
+        doc = self.pymupdf.open('pdf', self.blank_pdf)
+        try:
+            fonts_on_page = set()
+            for slot in self.slots:
+                page = doc[slot.page]
+                text = PLACEHOLDER_PATTERN.sub(substitute, slot.text)
+                fontname, font, buffer = (
+                    ('certb', self.bold_font, self.bold_font_buffer) if slot.bold
+                    else ('cert', self.font, self.font_buffer)
+                )
+                if (slot.page, fontname) not in fonts_on_page:
+                    page.insert_font(fontname=fontname, fontbuffer=buffer)
+                    fonts_on_page.add((slot.page, fontname))
+
+                # Thu nhỏ chữ nếu dòng mới dài hơn phần trang còn trống
+                fontsize = slot.fontsize
+                margin = min(slot.x0, page.rect.width - slot.x1)
+                if slot.align == 'center':
+                    max_width = page.rect.width - 2 * margin
+                else:
+                    max_width = page.rect.width - slot.x0 - margin
+                width = font.text_length(text, fontsize)
+                if width > max_width > 0:
+                    fontsize = fontsize * max_width / width
+                    width = max_width
+
+                if slot.align == 'center':
+                    x = (slot.x0 + slot.x1) / 2 - width / 2
+                else:
+                    x = slot.x0
+                page.insert_text((x, slot.baseline), text, fontname=fontname, fontsize=fontsize, color=slot.color)
+
+            target = output_target(output_file)
+            started = time.perf_counter()
+            doc.subset_fonts()
+            doc.save(target, garbage=1, deflate=True)
+            self.last_save_seconds = time.perf_counter() - started
+        finally:
+            doc.close()
+        return total_replacements
@@ -0,0 +1,130 @@
+import configparser
+import io
+import math
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# Generator riêng của mỗi tiến trình worker - template chỉ nạp một lần
+_worker_generator = None
+# Kích thước nhóm khi không biết trước số bản ghi (đọc dần từ file Excel)
+STREAM_CHUNK_SIZE = 16
+
+
+def config_to_text(config):
+    """Chuyển ConfigParser thành text (giá trị thô) để gửi sang tiến trình con"""
+    if config is None:
+        return None
+    buffer = io.StringIO()
+    config.write(buffer)
+    return buffer.getvalue()
+
+
+def _init_worker(template_path, config_text, logger_name):
+    global _worker_generator
+    from src.certificate.generator import CertificateGenerator
+    from src.logging.logger_setup import logging_settings, setup_logger
+
+    config = None
+    if config_text is not None:
+        config = configparser.ConfigParser()
+        config.read_string(config_text)
+    # Worker ghi log trực tiếp: handler kế thừa từ tiến trình cha (hàng đợi không có
+    # thread nền ở tiến trình con) được thay bằng handler riêng theo [LOGGING]
+    logger = setup_logger(logger_name, **dict(logging_settings(config), queued=False), reset=True)
+    _worker_generator = CertificateGenerator(template_path, logger, config)
+
+
+def render_record(generator, record):
+    """Render một bản ghi, ghi thời gian render/ghi file vào record.timings; trả về True/False
+
+    record.output_file = None: render vào bộ nhớ, nội dung DOCX nằm ở record.docx_data.
+    """
+    started = time.perf_counter()
+    buffer = io.BytesIO() if record.output_file is None else None
+    try:
+        ok = generator.create_certificate(
+            record.ho_ten, record.phap_danh, record.nam_sinh, record.don_vi,
+            record.output_file if buffer is None else buffer
+        )
+    except Exception as e:
+        generator.logger.error(f"❌ Lỗi xử lý {record.ho_ten}: {str(e)}")
+        ok = False
+    save = generator.last_save_seconds
+    record.timings = {'render': time.perf_counter() - started - save, 'save': save}
+    if buffer is not None and ok:
+        record.docx_data = buffer.getvalue()
+    return bool(ok)
+
+
+def _render_chunk(records):
+    """Render một nhóm bản ghi trong worker, trả về (ok, timings, docx_data) theo thứ tự
+
+    Khi render trong bộ nhớ, nội dung DOCX được gửi về tiến trình chính qua pipe của pool.
+    """
+    results = []
+    for record in records:
+        ok = render_record(_worker_generator, record)
+        results.append((ok, record.timings, record.docx_data))
+    return results
+
+
+def _iter_chunks(records, chunk_size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _collect(chunk, future):
+    for record, (ok, timings, docx_data) in zip(chunk, future.result()):
+        record.timings = timings
+        record.docx_data = docx_data
+        yield record, ok
+
+
+def create_render_pool(template_path, jobs, config=None, logger=None):
+    """Process pool render giấy khen: mỗi worker nạp template một lần khi khởi động"""
+    logger_name = logger.name if logger else __name__
+    return ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(str(template_path), config_to_text(config), logger_name),
+    )
+
+
+def iter_render_parallel(template_path, records, jobs, config=None, logger=None, chunk_size=None, executor=None):
+    """Render song song bằng process pool, yield (record, ok) đúng thứ tự đầu vào
+
+    Mỗi bản ghi là một Record (src.io.roster) đã có output_file (None = render
+    vào bộ nhớ); record.timings được điền thời gian render/ghi file. Mỗi worker nạp template một lần rồi
+    render từng nhóm bản ghi.
+    records có thể là iterator: bản ghi được lấy dần, chỉ vài nhóm được gửi
+    trước cho mỗi worker nên bộ nhớ không tăng theo kích thước danh sách.
+    executor: pool tạo sẵn bằng create_render_pool (được giữ lại sau khi xong,
+    vd. WarmSession); None = tạo pool mới và dừng khi xong.
+    """
+    if chunk_size is None:
+        if isinstance(records, (list, tuple)):
+            chunk_size = max(1, math.ceil(len(records) / (jobs * 4)))
+        else:
+            chunk_size = STREAM_CHUNK_SIZE
+    max_in_flight = jobs * 2
+
+    own_executor = None
+    if executor is None:
+        executor = own_executor = create_render_pool(template_path, jobs, config, logger)
+    try:
+        in_flight = deque()
+        for chunk in _iter_chunks(records, chunk_size):
+            in_flight.append((chunk, executor.submit(_render_chunk, chunk)))
+            if len(in_flight) >= max_in_flight:
+                yield from _collect(*in_flight.popleft())
+        while in_flight:
+            yield from _collect(*in_flight.popleft())
+    finally:
+        if own_executor:
+            own_executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,95 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Đánh dấu hết dữ liệu trong hàng đợi giữa hai bước
+_DONE = object()
+
+
+class Stage:
+    """Một bước của pipeline: hàm xử lý từng phần tử và số luồng chạy song song
+
+    Hàm nhận phần tử từ bước trước, kết quả trả về được đưa sang bước sau
+    (trả về None = không chuyển tiếp). Hàm chạy trên thread riêng của bước nên
+    có thể chặn (gọi LibreOffice, ghi file).
+    """
+
+    __slots__ = ('name', 'func', 'concurrency')
+
+    def __init__(self, name, func, concurrency=1):
+        self.name = name
+        self.func = func
+        self.concurrency = max(1, int(concurrency))
+
+
+async def _produce(loop, executor, iterator, queue, consumers):
+    """Lấy dần phần tử từ iterator (chạy trên thread riêng) đưa vào hàng đợi đầu tiên"""
+    while True:
+        item = await loop.run_in_executor(executor, next, iterator, _DONE)
+        if item is _DONE:
+            break
+        # Hàng đợi đầy: chờ bước sau xử lý bớt (backpressure)
+        await queue.put(item)
+    for _ in range(consumers):
+        await queue.put(_DONE)
+
+
+async def _work(loop, executor, stage, inbox, outbox):
+    while True:
+        item = await inbox.get()
+        if item is _DONE:
+            return
+        result = await loop.run_in_executor(executor, stage.func, item)
+        if outbox is not None and result is not None:
+            await outbox.put(result)
+
+
+async def _run_stage(loop, executor, stage, inbox, outbox, consumers):
+    await asyncio.gather(*(
+        _work(loop, executor, stage, inbox, outbox) for _ in range(stage.concurrency)
+    ))
+    for _ in range(consumers):
+        await outbox.put(_DONE)
+
+
+async def _run(source, stages, queue_size):
+    loop = asyncio.get_running_loop()
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in stages]
+    source_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pipeline-source')
+    executors = [
+        ThreadPoolExecutor(max_workers=stage.concurrency, thread_name_prefix=f'pipeline-{stage.name}')
+        for stage in stages
+    ]
+    tasks = [asyncio.ensure_future(_produce(loop, source_executor, source, queues[0], stages[0].concurrency))]
+    for i, stage in enumerate(stages):
+        last = i + 1 == len(stages)
+        tasks.append(asyncio.ensure_future(_run_stage(
+            loop, executors[i], stage, queues[i],
+            None if last else queues[i + 1], 0 if last else stages[i + 1].concurrency
+        )))
+    try:
+        # Bước nào lỗi thì dừng cả pipeline
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for executor in [source_executor] + executors:
+            executor.shutdown(wait=True)
+
+
+def run_pipeline(source, stages, queue_size=8):
+    """Chạy các bước đồng thời, nối với nhau bằng hàng đợi có giới hạn
+
+    source là iterator (vd. danh sách giấy khen đã render) được đọc trên một
+    thread riêng; mỗi phần tử lần lượt đi qua các Stage. Mỗi hàng đợi chứa tối
+    đa queue_size phần tử nên bước nhanh phải chờ bước chậm, tốc độ cả lượt do
+    bước chậm nhất quyết định thay vì tổng thời gian các bước.
+    """
+    iterator = iter(source)
+    try:
+        asyncio.run(_run(iterator, stages, max(1, int(queue_size))))
+    finally:
+        # Đóng generator nguồn (vd. dừng process pool render) nếu pipeline dừng giữa chừng
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
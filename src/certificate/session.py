@@ -0,0 +1,84 @@
+from src.certificate.generator import CertificateGenerator
+from src.certificate.parallel import config_to_text, create_render_pool
+from src.io.watcher import file_stamp
+
+# Các giá trị config quyết định bộ chuyển PDF - đổi thì khởi động lại bộ chuyển
+CONVERTER_OPTIONS = ('pdf_converter', 'soffice_path', 'converter_instances')
+
+
+def _stamps(paths):
+    return tuple((str(path), file_stamp(path)) for path in paths)
+
+
+class WarmSession:
+    """Giữ template đã biên dịch và bộ chuyển PDF đã khởi động giữa các lượt chạy
+
+    Dùng cho chế độ theo dõi thư mục (--watch): mỗi lượt chạy lấy lại
+    generator và bộ chuyển PDF từ đây thay vì tạo mới. Template chỉ được biên
+    dịch lại khi file phôi, file font/ảnh nền của layout hoặc config thay đổi;
+    bộ chuyển PDF chỉ khởi động lại khi cấu hình của nó thay đổi. Với --jobs > 1
+    process pool render cũng được giữ lại (mỗi worker đã nạp sẵn template) và
+    chỉ tạo lại khi template được biên dịch lại hoặc số tiến trình thay đổi.
+    """
+
+    def __init__(self, converter_factory, logger=None):
+        self.converter_factory = converter_factory
+        self.logger = logger
+        self._generator = None
+        self._generator_key = None
+        self._converter = None
+        self._converter_key = None
+        self._render_pool = None
+        self._render_pool_key = None
+
+    def generator(self, template_file, logger=None, config=None):
+        key = (config_to_text(config), _stamps([template_file]))
+        generator = self._generator
+        if generator is not None and key == self._generator_key[0] and _stamps(generator.asset_files) == self._generator_key[1]:
+            return generator
+        if generator is not None and self.logger:
+            self.logger.info(f"♻️ Phôi hoặc cấu hình đã thay đổi, biên dịch lại: {template_file.name}")
+        generator = CertificateGenerator(template_file, logger, config)
+        self._generator = generator
+        self._generator_key = (key, _stamps(generator.asset_files))
+        return generator
+
+    def converter(self, config=None, logger=None):
+        """Bộ chuyển PDF đã khởi động (dùng lại giữa các lượt, không dừng sau mỗi lượt)"""
+        key = tuple(config.get('PERFORMANCE', option, fallback='') for option in CONVERTER_OPTIONS) if config else ()
+        if self._converter is not None and key == self._converter_key:
+            return self._converter
+        if self._converter is not None:
+            if self.logger:
+                self.logger.info("♻️ Cấu hình bộ chuyển PDF đã thay đổi, khởi động lại")
+            self._converter.stop()
+            self._converter = None
+        converter = self.converter_factory(config, logger)
+        converter.start()
+        self._converter = converter
+        self._converter_key = key
+        return converter
+
+    def render_pool(self, template_file, jobs, config=None, logger=None):
+        """Process pool render đã nạp template (dùng lại giữa các lượt), gọi sau generator()"""
+        key = (self._generator_key, jobs)
+        if self._render_pool is not None and key == self._render_pool_key:
+            return self._render_pool
+        self.discard_render_pool()
+        self._render_pool = create_render_pool(template_file, jobs, config, logger)
+        self._render_pool_key = key
+        return self._render_pool
+
+    def discard_render_pool(self):
+        """Dừng process pool render (vd. sau lượt chạy lỗi - worker có thể đã chết), lượt sau tạo mới"""
+        if self._render_pool is not None:
+            self._render_pool.shutdown(wait=True, cancel_futures=True)
+            self._render_pool = None
+            self._render_pool_key = None
+
+    def close(self):
+        """Dừng bộ chuyển PDF và process pool render"""
+        self.discard_render_pool()
+        if self._converter is not None:
+            self._converter.stop()
+            self._converter = None
@@ -0,0 +1,119 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from pathlib import Path
+
+from src.converter.converters import create_converter
+from src.io.file_handler import memory_temp_dir
+from src.io.roster import Record
+
+# Các trường của một bản ghi dạng dict, theo thứ tự tham số của create_certificate
+RECORD_FIELDS = ('ho_ten', 'phap_danh', 'nam_sinh', 'don_vi')
+
+
+def as_record(item, seq=0):
+    """Record giữ nguyên; dict (ho_ten, phap_danh, nam_sinh, don_vi, stt) được chuyển thành Record"""
+    if isinstance(item, Record):
+        return item
+    values = [str(item.get(name) or '').strip() for name in RECORD_FIELDS]
+    try:
+        stt = int(item.get('stt') or seq + 1)
+    except (TypeError, ValueError):
+        stt = seq + 1
+    return Record(seq, stt, *values)
+
+
+def render_pdf_bytes(generator, record, converter=None, render_lock=None, timings=None):
+    """Tạo PDF của một bản ghi và trả về nội dung (bytes), không để lại file nào
+
+    DOCX được render trong bộ nhớ rồi chuyển PDF bằng converter (engine ghi
+    thẳng PDF không cần converter); file PDF tạm nằm trên RAM và bị xóa ngay
+    sau khi đọc. render_lock: khóa dùng chung khi nhiều thread cùng dùng một
+    generator (template đã biên dịch không an toàn khi render đồng thời).
+    timings (dict): được điền thời gian queue / render / convert (giây).
+    """
+    timings = {} if timings is None else timings
+    fd, pdf_path = tempfile.mkstemp(suffix='.pdf', dir=memory_temp_dir())
+    os.close(fd)
+    pdf_path = Path(pdf_path)
+    try:
+        output = pdf_path if generator.outputs_pdf else io.BytesIO()
+        started = time.perf_counter()
+        with render_lock or nullcontext():
+            # Thời gian chờ các thread khác render xong
+            timings['queue'] = time.perf_counter() - started
+            started = time.perf_counter()
+            ok = generator.create_certificate(record.ho_ten, record.phap_danh, record.nam_sinh, record.don_vi, output)
+        timings['render'] = time.perf_counter() - started
+        if ok and not generator.outputs_pdf:
+            started = time.perf_counter()
+            ok = converter.convert_bytes(output.getvalue(), pdf_path)
+            timings['convert'] = time.perf_counter() - started
+        if not ok or not pdf_path.stat().st_size:
+            raise RuntimeError(f"Không tạo được giấy khen cho {record.ho_ten}")
+        return pdf_path.read_bytes()
+    finally:
+        try:
+            pdf_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _pop_finished(in_flight, ordered):
+    """Kết quả tiếp theo: phần tử đầu hàng đợi (giữ thứ tự) hoặc mọi phần tử đã xong"""
+    if ordered:
+        return [in_flight.popleft().result()]
+    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+    finished = [future for future in in_flight if future in done]
+    for future in finished:
+        in_flight.remove(future)
+    return [future.result() for future in finished]
+
+
+def iter_pdfs(generator, records, converter=None, ordered=True, max_in_flight=None, workers=None):
+    """Render một iterable bản ghi, yield (record, pdf_bytes) hoặc (record, Exception) khi từng giấy khen xong
+
+    records: Record hoặc dict (ho_ten, phap_danh, nam_sinh, don_vi), được lấy
+    dần - không cần có đủ danh sách từ đầu. Tối đa max_in_flight giấy khen
+    đang xử lý cùng lúc (mặc định 2 × workers) nên bộ nhớ không tăng theo kích
+    thước danh sách. ordered=True: kết quả theo đúng thứ tự đầu vào;
+    ordered=False: giấy khen nào xong trước trả về trước.
+    converter: bộ chuyển PDF đã khởi động (None = tự tạo và dừng khi xong,
+    engine ghi thẳng PDF không cần). workers: số luồng chuyển PDF song song
+    (mặc định bằng số instance của bộ chuyển).
+    Dừng giữa chừng (break / close()) thì các giấy khen chưa bắt đầu bị hủy.
+    """
+    own_converter = None
+    if converter is None and not generator.outputs_pdf:
+        converter = own_converter = create_converter(generator.config, generator.logger)
+        converter.start()
+    workers = max(1, int(workers or getattr(converter, 'size', 1)))
+    max_in_flight = max(1, int(max_in_flight or workers * 2))
+    render_lock = threading.Lock()
+
+    def task(record):
+        try:
+            return record, render_pdf_bytes(generator, record, converter, render_lock)
+        except Exception as e:
+            if generator.logger:
+                generator.logger.error(f"❌ Lỗi xử lý {record.ho_ten}: {str(e)}")
+            return record, e
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='iter-pdfs')
+    in_flight = deque()
+    try:
+        for seq, item in enumerate(records):
+            in_flight.append(executor.submit(task, as_record(item, seq)))
+            if len(in_flight) >= max_in_flight:
+                yield from _pop_finished(in_flight, ordered)
+        while in_flight:
+            yield from _pop_finished(in_flight, ordered)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        if own_converter:
+            own_converter.stop()
@@ -0,0 +1,216 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_right
+from pathlib import Path
+from docx import Document
+from lxml import etree
+
+PLACEHOLDER_PATTERN = re.compile(r'<<[^>]+>>')
+# Các part có nội dung văn bản trong gói .docx
+STORY_PART_PATTERN = re.compile(r'^/word/(document|header\d*|footer\d*|footnotes|endnotes|comments)\.xml$')
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_P = f'{{{W_NS}}}p'
+W_T = f'{{{W_NS}}}t'
+XML_SPACE = '{http://www.w3.org/XML/1998/namespace}space'
+
+
+def is_stream(output_file):
+    """output_file là stream trong bộ nhớ (vd. io.BytesIO) thay vì đường dẫn file"""
+    return hasattr(output_file, 'write')
+
+
+def output_target(output_file):
+    """Đích ghi kết quả: stream giữ nguyên, đường dẫn thì tạo sẵn thư mục cha"""
+    if is_stream(output_file):
+        return output_file
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    return str(output_file)
+
+
+def iter_text_paragraphs(root):
+    """Mọi paragraph có w:t trong một part XML, mỗi paragraph đúng một lần
+
+    Duyệt cây XML một lượt theo thứ tự tài liệu, yield (paragraph, các w:t thuộc
+    trực tiếp paragraph). Paragraph lồng trong textbox/shape (w:txbxContent của
+    DrawingML và VML) được yield riêng, trước paragraph chứa nó.
+    """
+    stack = []
+    for event, element in etree.iterwalk(root, events=('start', 'end'), tag=(W_P, W_T)):
+        if element.tag == W_T:
+            if event == 'start' and stack:
+                stack[-1][1].append(element)
+        elif event == 'start':
+            stack.append((element, []))
+        else:
+            paragraph, nodes = stack.pop()
+            if nodes:
+                yield paragraph, nodes
+
+
+def iter_story_paragraphs(document):
+    """(part, paragraph, các w:t) của mọi part có nội dung trong file .docx đã mở bằng python-docx
+
+    Gồm thân văn bản, mọi header/footer, footnote, endnote và comment - kể cả
+    textbox, shape và bảng lồng nhau trong các part đó.
+    """
+    for part in document.part.package.iter_parts():
+        if STORY_PART_PATTERN.match(str(part.partname)) and hasattr(part, 'element'):
+            for paragraph, nodes in iter_text_paragraphs(part.element):
+                yield part, paragraph, nodes
+
+
+def substitute_placeholders(nodes, replacements, texts=None):
+    """Thay placeholder trong các w:t của một paragraph bằng một lượt quét
+
+    Text của paragraph được quét một lần bằng PLACEHOLDER_PATTERN. Giá trị của
+    mỗi placeholder có trong replacements được ghi vào w:t chứa ký tự đầu của
+    placeholder; phần placeholder bị tách sang các w:t sau được cắt bỏ. Chỉ các
+    w:t chồng lên placeholder bị sửa, các run khác giữ nguyên định dạng.
+    texts: text gốc của từng w:t (mặc định đọc từ nodes). Trả về số placeholder đã thay.
+    """
+    if texts is None:
+        texts = [t.text or '' for t in nodes]
+    full_text = ''.join(texts)
+    if '<<' not in full_text:
+        return 0
+
+    # Vị trí bắt đầu của từng w:t trong text ghép
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text)
+    pieces = [None] * len(nodes)
+
+    def keep(begin, end):
+        # Giữ nguyên text gốc trong khoảng [begin, end) cho các w:t tương ứng
+        k = bisect_right(starts, begin) - 1
+        while begin < end:
+            stop = min(end, starts[k] + len(texts[k]))
+            if stop > begin:
+                if pieces[k] is None:
+                    pieces[k] = []
+                pieces[k].append(texts[k][begin - starts[k]:stop - starts[k]])
+                begin = stop
+            k += 1
+
+    replaced = 0
+    cursor = 0
+    for match in PLACEHOLDER_PATTERN.finditer(full_text):
+        placeholder = match.group()
+        if placeholder not in replacements:
+            continue
+        keep(cursor, match.start())
+        k = bisect_right(starts, match.start()) - 1
+        if pieces[k] is None:
+            pieces[k] = []
+        value = replacements[placeholder]
+        pieces[k].append(str(value) if value else '')
+        # Các w:t khác nằm trong placeholder bị cắt phần placeholder
+        for j in range(k + 1, bisect_right(starts, match.end() - 1)):
+            if pieces[j] is None:
+                pieces[j] = []
+        cursor = match.end()
+        replaced += 1
+
+    if not replaced:
+        return 0
+    keep(cursor, len(full_text))
+    for t, text, parts in zip(nodes, texts, pieces):
+        if parts is None:
+            continue
+        new_text = ''.join(parts)
+        if new_text != text:
+            t.text = new_text
+            t.set(XML_SPACE, 'preserve')
+    return replaced
+
+
+class PlaceholderSlot:
+    """Một paragraph trong template có chứa placeholder
+
+    Giữ các w:t của paragraph và text gốc của chúng: khi render chỉ các w:t
+    chứa placeholder bị sửa, sau đó được khôi phục lại text gốc.
+    """
+
+    __slots__ = ('location', 'nodes', 'pristine', 'placeholders')
+
+    def __init__(self, location, nodes, placeholders):
+        self.location = location
+        self.nodes = nodes
+        # Text gốc của từng w:t để khôi phục sau mỗi lần render
+        self.pristine = [t.text or '' for t in nodes]
+        self.placeholders = placeholders
+
+    def fill(self, replacements):
+        """Thay placeholder trong paragraph, trả về số placeholder đã thay"""
+        return substitute_placeholders(self.nodes, replacements, self.pristine)
+
+    def restore(self):
+        """Khôi phục paragraph về trạng thái gốc của template"""
+        for t, text in zip(self.nodes, self.pristine):
+            t.text = text
+
+
+class CompiledTemplate:
+    """Template đã được phân tích một lần - ghi nhớ vị trí các placeholder
+
+    Template chỉ được đọc một lần. Mỗi lần render chỉ sửa các paragraph có
+    placeholder, lưu file rồi khôi phục lại các paragraph đó về bản gốc.
+    """
+
+    def __init__(self, template_path, logger=None):
+        self.template_path = Path(template_path)
+        self.logger = logger or logging.getLogger(__name__)
+        self.document = Document(str(self.template_path))
+        self.slots = []
+        # Thời gian ghi file của lần render gần nhất (giây)
+        self.last_save_seconds = 0.0
+        self._lock = threading.Lock()
+        self._compile()
+
+    def _compile(self):
+        """Duyệt mọi part của template một lượt và ghi nhận các paragraph có placeholder"""
+        counters = {}
+        for part, paragraph, nodes in iter_story_paragraphs(self.document):
+            partname = str(part.partname)
+            index = counters[partname] = counters.get(partname, -1) + 1
+            found = PLACEHOLDER_PATTERN.findall(''.join(t.text or '' for t in nodes))
+            if found:
+                self.slots.append(PlaceholderSlot(f"{partname} Para{index}", nodes, tuple(found)))
+
+    @property
+    def placeholders(self):
+        """Danh sách placeholder (không trùng) có trong template"""
+        found = set()
+        for slot in self.slots:
+            found.update(slot.placeholders)
+        return sorted(found)
+
+    def render(self, replacements, output_file):
+        """Render một giấy khen từ kế hoạch đã biên dịch, trả về số placeholder đã thay thế
+
+        output_file là đường dẫn .docx hoặc stream nhị phân (io.BytesIO).
+        """
+        with self._lock:
+            modified = []
+            total_replacements = 0
+            try:
+                for slot in self.slots:
+                    replaced = slot.fill(replacements)
+                    if replaced:
+                        modified.append(slot)
+                        total_replacements += replaced
+
+                target = output_target(output_file)
+                started = time.perf_counter()
+                self.document.save(target)
+                self.last_save_seconds = time.perf_counter() - started
+            finally:
+                for slot in modified:
+                    slot.restore()
+            return total_replacements
@@ -0,0 +1,71 @@
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+from src.converter.libreoffice import LibreOfficeService, find_soffice
+from src.converter.pool import LibreOfficePool, resolve_workers
+from src.io.file_handler import memory_temp_dir
+
+PDF_CONVERTERS = ('auto', 'docx2pdf', 'libreoffice')
+
+
+class Docx2PdfConverter:
+    """Chuyển PDF bằng docx2pdf (cần Microsoft Word trên Windows)"""
+
+    # Word COM không chạy song song được
+    size = 1
+
+    def __init__(self, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+        from docx2pdf import convert
+        self._convert = convert
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def convert(self, docx_path, pdf_path):
+        pdf_path = Path(pdf_path)
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
+        self._convert(str(docx_path), str(pdf_path))
+        return True
+
+    def convert_bytes(self, data, pdf_path):
+        """Word chỉ mở được file: DOCX được ghi vào thư mục tạm cục bộ (không phải thư mục output)"""
+        pdf_path = Path(pdf_path)
+        with tempfile.TemporaryDirectory(prefix='certifynow_docx_', dir=memory_temp_dir()) as in_dir:
+            docx_path = Path(in_dir) / f"{pdf_path.stem}.docx"
+            docx_path.write_bytes(data)
+            return self.convert(docx_path, pdf_path)
+
+
+def create_converter(config=None, logger=None):
+    """Tạo bộ chuyển PDF theo cấu hình [PERFORMANCE] pdf_converter"""
+    logger = logger or logging.getLogger(__name__)
+    choice = 'auto'
+    soffice_path = ''
+    instances = 1
+    if config:
+        choice = config.get('PERFORMANCE', 'pdf_converter', fallback='auto').strip().lower() or 'auto'
+        soffice_path = config.get('PERFORMANCE', 'soffice_path', fallback='').strip()
+        instances = resolve_workers(config.get('PERFORMANCE', 'converter_instances', fallback='1'))
+
+    if choice not in PDF_CONVERTERS:
+        raise ValueError(f"pdf_converter không hợp lệ: {choice} (chọn: {', '.join(PDF_CONVERTERS)})")
+
+    if choice == 'docx2pdf' or (choice == 'auto' and sys.platform == "win32"):
+        try:
+            return Docx2PdfConverter(logger)
+        except ImportError:
+            if choice == 'docx2pdf':
+                raise
+            logger.warning("⚠️ Không có docx2pdf, chuyển sang LibreOffice")
+
+    if not find_soffice(soffice_path):
+        raise FileNotFoundError("Không tìm thấy LibreOffice (soffice) để chuyển PDF")
+    if instances > 1:
+        return LibreOfficePool(instances, logger, soffice_path)
+    return LibreOfficeService(logger, soffice_path)
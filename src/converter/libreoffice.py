@@ -0,0 +1,294 @@
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from src.io.file_handler import memory_temp_dir
+
+
+def find_soffice(custom_path=''):
+    """Tìm đường dẫn soffice/libreoffice trên máy"""
+    if custom_path:
+        return custom_path
+    for name in ('soffice', 'libreoffice'):
+        found = shutil.which(name)
+        if found:
+            return found
+    if sys.platform == "win32":
+        for base in (os.environ.get('PROGRAMFILES', ''), os.environ.get('PROGRAMFILES(X86)', '')):
+            candidate = Path(base) / 'LibreOffice' / 'program' / 'soffice.exe'
+            if base and candidate.exists():
+                return str(candidate)
+    elif sys.platform == "darwin":
+        candidate = Path('/Applications/LibreOffice.app/Contents/MacOS/soffice')
+        if candidate.exists():
+            return str(candidate)
+    return None
+
+
+def _property(name, value):
+    import uno
+    prop = uno.createUnoStruct('com.sun.star.beans.PropertyValue')
+    prop.Name = name
+    prop.Value = value
+    return prop
+
+
+class LibreOfficeService:
+    """Một tiến trình soffice headless chạy thường trực
+
+    soffice được khởi động một lần và lắng nghe trên named pipe. Mỗi file DOCX
+    được gửi qua UNO để chuyển PDF, không phải khởi động lại LibreOffice. Nếu
+    tiến trình chết, service tự khởi động lại ở lần chuyển kế tiếp.
+
+    Khi không có module `uno` (python3-uno), service dùng chế độ gọi soffice
+    cho từng file nhưng vẫn giữ profile riêng.
+    """
+
+    # Một instance chỉ chuyển một file tại một thời điểm
+    size = 1
+
+    def __init__(self, logger=None, soffice_path='', profile_dir=None, start_timeout=30, convert_timeout=120):
+        self.logger = logger or logging.getLogger(__name__)
+        self.soffice = find_soffice(soffice_path)
+        self.start_timeout = start_timeout
+        self.convert_timeout = convert_timeout
+        self.pipe_name = f"certifynow_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self._owns_profile = profile_dir is None
+        self.profile_dir = Path(profile_dir or tempfile.mkdtemp(prefix='certifynow_lo_'))
+        self._process = None
+        self._context = None
+        self._desktop = None
+        self._lock = threading.Lock()
+
+        try:
+            import uno  # noqa: F401
+            self.use_uno = True
+        except ImportError:
+            self.use_uno = False
+            if self.logger:
+                self.logger.warning("⚠️ Không có module uno, LibreOffice sẽ chạy riêng cho từng file")
+
+    @property
+    def available(self):
+        return self.soffice is not None
+
+    def _base_command(self):
+        return [
+            self.soffice, '--headless', '--invisible', '--nologo', '--norestore',
+            '--nodefault', '--nofirststartwizard', '--nolockcheck',
+            f'-env:UserInstallation={self.profile_dir.resolve().as_uri()}',
+        ]
+
+    def start(self):
+        """Khởi động soffice và kết nối UNO"""
+        if not self.use_uno:
+            return
+        if not self.available:
+            raise FileNotFoundError("Không tìm thấy LibreOffice (soffice)")
+
+        import uno
+        from com.sun.star.connection import NoConnectException
+
+        cmd = self._base_command() + [f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext']
+        self._process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context
+        )
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            try:
+                context = resolver.resolve(
+                    f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+                )
+                break
+            except NoConnectException:
+                if self._process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError("Không thể kết nối tới LibreOffice")
+                time.sleep(0.2)
+
+        self._context = context
+        self._desktop = context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.frame.Desktop', context
+        )
+        if self.logger:
+            self.logger.info(f"🚀 Đã khởi động LibreOffice (pid {self._process.pid})")
+
+    def stop(self):
+        """Dừng soffice và xóa profile tạm"""
+        if self._desktop is not None:
+            try:
+                self._desktop.terminate()
+            except Exception:
+                pass
+            self._desktop = None
+            self._context = None
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            self._process = None
+        if self._owns_profile:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def is_alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def _convert_uno(self, docx_path, pdf_path):
+        import uno
+        document = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(str(docx_path.resolve())), '_blank', 0,
+            (_property('Hidden', True), _property('ReadOnly', True))
+        )
+        if document is None:
+            raise RuntimeError(f"LibreOffice không mở được file: {docx_path.name}")
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(str(pdf_path.resolve())),
+                (_property('FilterName', 'writer_pdf_Export'),)
+            )
+        finally:
+            document.close(True)
+
+    def _convert_uno_bytes(self, data, pdf_path):
+        """Nạp DOCX từ bộ nhớ qua InputStream của UNO (không có file DOCX trên đĩa)"""
+        import uno
+        stream = self._context.ServiceManager.createInstanceWithArgumentsAndContext(
+            'com.sun.star.io.SequenceInputStream', (uno.ByteSequence(data),), self._context
+        )
+        document = self._desktop.loadComponentFromURL(
+            'private:stream', '_blank', 0,
+            (_property('InputStream', stream), _property('FilterName', 'MS Word 2007 XML'),
+             _property('Hidden', True), _property('ReadOnly', True))
+        )
+        if document is None:
+            raise RuntimeError("LibreOffice không mở được nội dung DOCX trong bộ nhớ")
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(str(pdf_path.resolve())),
+                (_property('FilterName', 'writer_pdf_Export'),)
+            )
+        finally:
+            document.close(True)
+
+    def _convert_subprocess(self, docx_path, pdf_path):
+        if not self.available:
+            raise FileNotFoundError("Không tìm thấy LibreOffice (soffice)")
+        with tempfile.TemporaryDirectory(prefix='certifynow_pdf_', dir=memory_temp_dir()) as out_dir:
+            cmd = self._base_command() + ['--convert-to', 'pdf', '--outdir', out_dir, str(docx_path)]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=self.convert_timeout)
+            produced = Path(out_dir) / f"{docx_path.stem}.pdf"
+            if result.returncode != 0 or not produced.exists():
+                raise RuntimeError(result.stderr.strip() or "LibreOffice không tạo được PDF")
+            shutil.move(str(produced), str(pdf_path))
+
+    def _convert_subprocess_bytes(self, data, pdf_path):
+        # soffice chạy riêng chỉ đọc được file: ghi DOCX vào thư mục tạm trên RAM
+        with tempfile.TemporaryDirectory(prefix='certifynow_docx_', dir=memory_temp_dir()) as in_dir:
+            docx_path = Path(in_dir) / f"{pdf_path.stem}.docx"
+            docx_path.write_bytes(data)
+            self._convert_subprocess(docx_path, pdf_path)
+
+    def convert(self, docx_path, pdf_path):
+        """Chuyển DOCX sang PDF, tự khởi động lại soffice nếu bị chết"""
+        docx_path = Path(docx_path)
+        return self._run(
+            pdf_path,
+            lambda target: self._convert_uno(docx_path, target),
+            lambda target: self._convert_subprocess(docx_path, target),
+        )
+
+    def convert_bytes(self, data, pdf_path):
+        """Chuyển DOCX nằm trong bộ nhớ (bytes) sang PDF, chỉ file PDF được ghi ra đĩa"""
+        return self._run(
+            pdf_path,
+            lambda target: self._convert_uno_bytes(data, target),
+            lambda target: self._convert_subprocess_bytes(data, target),
+        )
+
+    def _run(self, pdf_path, convert_uno, convert_subprocess):
+        pdf_path = Path(pdf_path)
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            if not self.use_uno:
+                convert_subprocess(pdf_path)
+                return True
+
+            for attempt in (1, 2):
+                if not self.is_alive():
+                    if self._process is not None and self.logger:
+                        self.logger.warning("⚠️ LibreOffice đã dừng, đang khởi động lại...")
+                    self.stop_process()
+                    self.start()
+                try:
+                    self._convert_with_deadline(convert_uno, pdf_path)
+                    return True
+                except TimeoutError:
+                    # File làm LibreOffice treo thường sẽ treo lại - không thử lại
+                    self.stop_process()
+                    raise
+                except Exception as e:
+                    if attempt == 2 or self.is_alive():
+                        raise
+                    if self.logger:
+                        self.logger.warning(f"⚠️ Mất kết nối LibreOffice ({e}), thử lại...")
+        return False
+
+    def _convert_with_deadline(self, convert_uno, pdf_path):
+        """Chuyển qua UNO với giới hạn convert_timeout giây
+
+        Lời gọi UNO không có timeout riêng: quá hạn thì dừng hẳn tiến trình soffice,
+        lời gọi đang treo sẽ lỗi và thoát ra; lần chuyển sau tự khởi động lại soffice.
+        """
+        expired = threading.Event()
+        process = self._process
+
+        def kill():
+            expired.set()
+            if self.logger:
+                self.logger.error(f"⏱️ LibreOffice không phản hồi sau {self.convert_timeout}s, dừng tiến trình")
+            try:
+                process.kill()
+            except Exception:
+                pass
+
+        timer = threading.Timer(self.convert_timeout, kill)
+        timer.daemon = True
+        timer.start()
+        try:
+            convert_uno(pdf_path)
+        except Exception:
+            if expired.is_set():
+                raise TimeoutError(f"LibreOffice quá {self.convert_timeout}s khi chuyển {pdf_path.name}") from None
+            raise
+        finally:
+            timer.cancel()
+        if expired.is_set():
+            raise TimeoutError(f"LibreOffice quá {self.convert_timeout}s khi chuyển {pdf_path.name}")
+
+    def stop_process(self):
+        """Dừng tiến trình soffice nhưng giữ lại profile để khởi động lại"""
+        owns_profile = self._owns_profile
+        self._owns_profile = False
+        try:
+            self.stop()
+        finally:
+            self._owns_profile = owns_profile
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,82 @@
+import logging
+import os
+import queue
+import shutil
+import tempfile
+from pathlib import Path
+
+from src.converter.libreoffice import LibreOfficeService
+
+
+def resolve_workers(value, default=1):
+    """Đổi giá trị cấu hình số worker ('auto' hoặc số) thành số nguyên >= 1"""
+    value = str(value).strip().lower() if value is not None else ''
+    if not value:
+        return default
+    if value == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+class LibreOfficePool:
+    """Nhóm N tiến trình LibreOffice headless, mỗi tiến trình có profile riêng
+
+    Mỗi lần chuyển PDF lấy một instance đang rảnh, chuyển xong trả lại nhóm,
+    nên có thể gọi `convert` đồng thời từ nhiều thread.
+    """
+
+    def __init__(self, size, logger=None, soffice_path=''):
+        self.size = max(1, int(size))
+        self.logger = logger or logging.getLogger(__name__)
+        self.profile_root = Path(tempfile.mkdtemp(prefix='certifynow_pool_'))
+        self.services = [
+            LibreOfficeService(self.logger, soffice_path, profile_dir=self.profile_root / f"instance_{i}")
+            for i in range(self.size)
+        ]
+        self._idle = queue.Queue()
+
+    @property
+    def available(self):
+        return self.services[0].available
+
+    def start(self):
+        """Khởi động tất cả instance; một instance lỗi thì dừng các instance đã chạy và xóa profile"""
+        self._idle = queue.Queue()
+        try:
+            for service in self.services:
+                service.start()
+                self._idle.put(service)
+        except BaseException:
+            self.stop()
+            raise
+        if self.logger:
+            self.logger.info(f"🏭 Đã khởi động {self.size} instance LibreOffice")
+
+    def stop(self):
+        """Dừng tất cả instance và xóa thư mục profile"""
+        for service in self.services:
+            service.stop()
+        shutil.rmtree(self.profile_root, ignore_errors=True)
+
+    def convert(self, docx_path, pdf_path):
+        """Chuyển PDF bằng instance đang rảnh (chặn cho tới khi có instance)"""
+        service = self._idle.get()
+        try:
+            return service.convert(docx_path, pdf_path)
+        finally:
+            self._idle.put(service)
+
+    def convert_bytes(self, data, pdf_path):
+        """Chuyển DOCX trong bộ nhớ sang PDF bằng instance đang rảnh"""
+        service = self._idle.get()
+        try:
+            return service.convert_bytes(data, pdf_path)
+        finally:
+            self._idle.put(service)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
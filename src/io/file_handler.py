@@ -1,6 +1,11 @@
 
 from pathlib import Path
+import os
 import shutil
+import tempfile
+
+# Thư mục tạm nằm trên RAM (Linux)
+SHM_FOLDER = Path('/dev/shm')
 
 def create_folders(folder_list):
     """Tạo các thư mục cần thiết"""
@@ -17,6 +22,12 @@ def validate_files(file_path, extensions):
         return False
     return file_path.suffix.lower() in extensions
 
+def memory_temp_dir():
+    """Thư mục tạm trên RAM nếu có (/dev/shm), nếu không thì thư mục tạm cục bộ của hệ thống"""
+    if SHM_FOLDER.is_dir() and os.access(SHM_FOLDER, os.W_OK):
+        return str(SHM_FOLDER)
+    return tempfile.gettempdir()
+
 def clean_temp_files(temp_folder):
     """Dọn dẹp thư mục tạm"""
     temp_folder = Path(temp_folder)
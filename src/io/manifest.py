@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+MANIFEST_NAME = '.certifynow_manifest.json'
+# Các mục config ảnh hưởng tới nội dung giấy khen
+CONTENT_SECTIONS = ('CERTIFICATE', 'PLACEHOLDERS', 'OVERLAY')
+RECORD_FIELDS = ('ho_ten', 'phap_danh', 'nam_sinh', 'don_vi')
+
+
+def file_sha256(path):
+    """Hash nội dung file, đọc theo từng khối"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_fingerprint(template_path, config=None, asset_files=()):
+    """Hash của template, các file template tham chiếu tới (font, ảnh nền) và các giá trị config quyết định nội dung giấy khen"""
+    digest = hashlib.sha256()
+    digest.update(file_sha256(template_path).encode('ascii'))
+    for path in asset_files:
+        digest.update(file_sha256(path).encode('ascii'))
+    if config:
+        for section in CONTENT_SECTIONS:
+            if config.has_section(section):
+                for key, value in sorted(config.items(section, raw=True)):
+                    digest.update(f"[{section}]{key}={value}\n".encode('utf-8'))
+        digest.update(config.get('PERFORMANCE', 'render_engine', fallback='docx').encode('utf-8'))
+        # Ngày cấp để trống nghĩa là ngày hiện tại - đổi ngày thì phải tạo lại
+        if not config.get('CERTIFICATE', 'issued_date', fallback='').strip():
+            digest.update(datetime.now().strftime("%Y%m%d").encode('ascii'))
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """Manifest của thư mục output: hash của từng giấy khen đã tạo
+
+    Lần chạy sau bỏ qua các bản ghi có file PDF đã tồn tại và hash khớp (cùng
+    template, cùng config, cùng dữ liệu), chỉ tạo lại bản ghi mới hoặc đã sửa.
+    """
+
+    def __init__(self, output_folder, fingerprint, save_every=20):
+        self.path = Path(output_folder) / MANIFEST_NAME
+        self.fingerprint = fingerprint
+        self.save_every = max(1, int(save_every))
+        self.entries = {}
+        self._unsaved = 0
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+                self.entries = data.get('records', {})
+            except (ValueError, OSError):
+                self.entries = {}
+
+    @classmethod
+    def for_run(cls, output_folder, template_path, config=None, asset_files=()):
+        return cls(output_folder, content_fingerprint(template_path, config, asset_files))
+
+    def record_hash(self, record):
+        digest = hashlib.sha256(self.fingerprint.encode('ascii'))
+        for field in RECORD_FIELDS:
+            digest.update(b'\x1f')
+            digest.update(str(getattr(record, field, '')).encode('utf-8'))
+        return digest.hexdigest()
+
+    def is_current(self, record):
+        """True nếu file PDF của bản ghi đã có và được tạo từ đúng dữ liệu hiện tại"""
+        pdf_file = Path(record.pdf_file)
+        return pdf_file.exists() and self.entries.get(pdf_file.name) == self.record_hash(record)
+
+    def mark(self, record):
+        """Ghi nhận bản ghi đã tạo xong; lưu manifest định kỳ để chạy tiếp được nếu bị dừng"""
+        self.entries[Path(record.pdf_file).name] = self.record_hash(record)
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_name(self.path.name + '.tmp')
+        partial.write_text(
+            json.dumps({'fingerprint': self.fingerprint, 'records': self.entries}, ensure_ascii=False, indent=1),
+            encoding='utf-8'
+        )
+        os.replace(partial, self.path)
+        self._unsaved = 0
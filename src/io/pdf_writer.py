@@ -0,0 +1,245 @@
+import hashlib
+import io
+import logging
+import os
+from pathlib import Path
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
+
+PDF_HEADER = b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n'
+# Các object gắn với một trang cụ thể, không được dùng chung
+UNSHARED_TYPES = ('/Page', '/Annot')
+
+
+class _CopyState:
+    """Bảng ánh xạ object của một file PDF nguồn sang số object trong file gộp"""
+
+    __slots__ = ('done', 'active')
+
+    def __init__(self):
+        # (idnum, generation) nguồn → số object mới
+        self.done = {}
+        # Object đang được chép (phát hiện vòng tham chiếu) → số object đã giữ chỗ
+        self.active = {}
+
+
+class StreamingPdfWriter:
+    """Ghi file PDF gộp theo kiểu stream
+
+    Các trang của mỗi giấy khen được chép và ghi xuống đĩa ngay khi được thêm
+    vào. Bộ nhớ chỉ giữ bảng offset của các object và danh sách trang, nên không
+    tăng theo kích thước lô. Kết quả có thể đến không theo thứ tự: `append(path,
+    seq)` giữ lại các file đến sớm cho tới khi tới lượt để trang luôn theo STT.
+
+    Với deduplicate=True, các object giống hệt nhau từng byte (font, ảnh nền,
+    XObject...) giữa các giấy khen chỉ được ghi một lần; các trang sau tham
+    chiếu tới bản đã ghi.
+    """
+
+    def __init__(self, output_path, flush_every=50, logger=None, deduplicate=False):
+        self.output_path = Path(output_path)
+        self.flush_every = max(1, int(flush_every))
+        self.logger = logger or logging.getLogger(__name__)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._part_path = self.output_path.with_name(self.output_path.name + '.part')
+        self._file = open(self._part_path, 'wb')
+        self._file.write(PDF_HEADER)
+        # _offsets[i] là vị trí của object số i (object 0 không dùng)
+        self._offsets = [0]
+        self._kids = []
+        self._waiting = {}
+        self._next_seq = 0
+        self._unflushed = 0
+        self.deduplicate = deduplicate
+        # sha256 nội dung object → số object đã ghi
+        self._shared = {}
+        self.shared_hits = 0
+        self.shared_bytes = 0
+        self._pages_id = self._reserve()
+
+    @property
+    def page_count(self):
+        return len(self._kids)
+
+    def _reserve(self):
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _write_object(self, obj_id, body):
+        self._write_bytes(obj_id, _serialize(body))
+
+    def _write_bytes(self, obj_id, data):
+        self._offsets[obj_id] = self._file.tell()
+        self._file.write(f"{obj_id} 0 obj\n".encode('ascii'))
+        self._file.write(data)
+        self._file.write(b"\nendobj\n")
+
+    def _copy_ref(self, ref, state):
+        """Chép object được tham chiếu (và các object con) sang file gộp"""
+        key = (ref.idnum, ref.generation)
+        if key in state.done:
+            return state.done[key]
+        if key in state.active:
+            # Vòng tham chiếu: giữ chỗ số object, ghi khi chép xong object gốc
+            if state.active[key] is None:
+                state.active[key] = self._reserve()
+            return state.active[key]
+
+        state.active[key] = None
+        source = ref.get_object()
+        body = NullObject() if source is None else self._copy_value(source, state)
+        new_id = state.active.pop(key)
+        if new_id is not None:
+            self._write_object(new_id, body)
+        else:
+            new_id = self._store(body)
+        state.done[key] = new_id
+        return new_id
+
+    def _store(self, body):
+        """Ghi một object đã chép xong, dùng lại bản đã ghi nếu trùng nội dung"""
+        data = _serialize(body)
+        digest = None
+        if self.deduplicate and not (isinstance(body, DictionaryObject) and body.get('/Type') in UNSHARED_TYPES):
+            digest = hashlib.sha256(data).digest()
+            existing = self._shared.get(digest)
+            if existing is not None:
+                self.shared_hits += 1
+                self.shared_bytes += len(data)
+                return existing
+
+        new_id = self._reserve()
+        self._write_bytes(new_id, data)
+        if digest is not None:
+            self._shared[digest] = new_id
+        return new_id
+
+    def _copy_value(self, value, state):
+        if isinstance(value, IndirectObject):
+            return IndirectObject(self._copy_ref(value, state), 0, None)
+
+        if isinstance(value, DictionaryObject):
+            if isinstance(value, StreamObject):
+                copied = EncodedStreamObject() if isinstance(value, EncodedStreamObject) else DecodedStreamObject()
+                copied._data = value._data
+            else:
+                copied = DictionaryObject()
+            is_page = value.get('/Type') in ('/Page', '/Pages')
+            for key, item in value.items():
+                # Không đi ngược lên cây trang của file nguồn
+                if is_page and key == '/Parent':
+                    continue
+                copied[NameObject(key)] = self._copy_value(item, state)
+            if value.get('/Type') == '/Page':
+                copied[NameObject('/Parent')] = IndirectObject(self._pages_id, 0, None)
+            return copied
+
+        if isinstance(value, ArrayObject):
+            return ArrayObject(self._copy_value(item, state) for item in value)
+
+        return value
+
+    def _write_pdf(self, pdf_path):
+        reader = PdfReader(str(pdf_path))
+        state = _CopyState()
+        for page in reader.pages:
+            self._kids.append(self._copy_ref(page.indirect_reference, state))
+            self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self._file.flush()
+            self._unflushed = 0
+
+    def append(self, pdf_path, seq=None):
+        """Thêm các trang của một file PDF; seq là thứ tự mong muốn (0, 1, 2, ...)"""
+        if seq is None:
+            self._write_pdf(pdf_path)
+            return
+        self._waiting[seq] = pdf_path
+        self._drain()
+
+    def skip(self, seq):
+        """Đánh dấu một vị trí không có file (giấy khen bị lỗi)"""
+        self._waiting[seq] = None
+        self._drain()
+
+    def _drain(self):
+        while self._next_seq in self._waiting:
+            pdf_path = self._waiting.pop(self._next_seq)
+            self._next_seq += 1
+            if pdf_path is not None:
+                self._write_pdf(pdf_path)
+
+    def close(self):
+        """Ghi cây trang, catalog, bảng xref và hoàn tất file. Trả về số trang"""
+        # Các file còn chờ (do thiếu thứ tự ở giữa) được ghi theo thứ tự seq
+        for seq in sorted(self._waiting):
+            if self._waiting[seq] is not None:
+                self._write_pdf(self._waiting[seq])
+        self._waiting.clear()
+
+        pages = DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(IndirectObject(kid, 0, None) for kid in self._kids),
+            NameObject('/Count'): NumberObject(len(self._kids)),
+        })
+        self._write_object(self._pages_id, pages)
+        catalog_id = self._reserve()
+        self._write_object(catalog_id, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(self._pages_id, 0, None),
+        }))
+
+        xref_offset = self._file.tell()
+        self._file.write(f"xref\n0 {len(self._offsets)}\n".encode('ascii'))
+        self._file.write(b"0000000000 65535 f \n")
+        for offset in self._offsets[1:]:
+            self._file.write(f"{offset or 0:010d} 00000 n \n".encode('ascii'))
+        self._file.write(
+            f"trailer\n<< /Size {len(self._offsets)} /Root {catalog_id} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n".encode('ascii')
+        )
+        self._file.close()
+        os.replace(self._part_path, self.output_path)
+        return len(self._kids)
+
+    def abort(self):
+        """Hủy file đang ghi dở"""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            self._part_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def merge_pdf_files(pdf_files, output_path, flush_every=50, deduplicate=False):
+    """Gộp các file PDF theo đúng thứ tự vào một file, trả về số trang
+
+    Hàm ở mức module để chạy được trong tiến trình worker (ProcessPoolExecutor):
+    mỗi nhóm được gộp trong một tiến trình riêng, song song với các nhóm khác.
+    """
+    writer = StreamingPdfWriter(output_path, flush_every, deduplicate=deduplicate)
+    try:
+        for pdf_file in pdf_files:
+            writer.append(pdf_file)
+        return writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def _serialize(body):
+    buffer = io.BytesIO()
+    body.write_to_stream(buffer, None)
+    return buffer.getvalue()
@@ -0,0 +1,243 @@
+from operator import itemgetter
+from pathlib import Path
+
+# Tên cột trong Excel → tên dùng trong chương trình
+COLUMN_MAPPING = {
+    'Tt': 'STT',
+    'Họ và tên': 'HoTen',
+    'Pháp danh': 'PhapDanh',
+    'Năm sinh': 'NamSinh',
+    'Đơn vị': 'DonVi',
+    'Điểm': 'Diem',
+    'Ghi chú': 'GhiChu'
+}
+NAME_COLUMN = 'Họ và tên'
+# Các cột của một bản ghi, theo thứ tự đọc ra từ mỗi hàng
+RECORD_COLUMNS = ('HoTen', 'STT', 'PhapDanh', 'NamSinh', 'DonVi', 'GhiChu')
+# Ký tự không dùng được trong tên file
+FILENAME_TABLE = str.maketrans({' ': '_', '/': '_', '\\': '_'})
+
+
+class Record:
+    """Một người nhận giấy khen (đã chuẩn hóa), dùng chung cho bước xem trước và render"""
+
+    __slots__ = (
+        'seq', 'stt', 'ho_ten', 'phap_danh', 'nam_sinh', 'don_vi', 'file_stem', 'output_file', 'pdf_file', 'source',
+        'docx_data', 'timings', 'group'
+    )
+
+    def __init__(self, seq, stt, ho_ten, phap_danh='', nam_sinh='', don_vi=''):
+        # Vị trí trong danh sách - thứ tự trang trong file gộp
+        self.seq = seq
+        self.stt = stt
+        self.ho_ten = ho_ten
+        self.phap_danh = phap_danh
+        self.nam_sinh = nam_sinh
+        self.don_vi = don_vi
+        # Tên file (không có đuôi): 001_Nguyen_Van_A
+        self.file_stem = f"{stt:03d}_{ho_ten.translate(FILENAME_TABLE)}"
+        # File được render ra và file PDF cuối cùng (gán khi chuẩn bị render)
+        self.output_file = None
+        self.pdf_file = None
+        # Nội dung DOCX khi render trong bộ nhớ (output_file = None), giải phóng sau khi chuyển PDF
+        self.docx_data = None
+        # RosterSource chứa bản ghi (khi chạy nhiều file/sheet)
+        self.source = None
+        # Thời gian render / ghi file (giây), do bước render điền vào
+        self.timings = None
+        # Giá trị cột dùng để gộp PDF theo nhóm ([OUTPUT] group_by), '' = không chia nhóm
+        self.group = ''
+
+
+class RosterSource:
+    """Một nguồn danh sách: một sheet trong một file Excel"""
+
+    __slots__ = ('excel_file', 'sheet', 'key')
+
+    def __init__(self, excel_file, sheet=None, key=''):
+        self.excel_file = Path(excel_file)
+        # None = sheet đầu tiên
+        self.sheet = sheet
+        # Thư mục con chứa kết quả của nguồn này ('' = thư mục output chung)
+        self.key = key
+
+    @property
+    def label(self):
+        return f"{self.excel_file.name} [{self.sheet}]" if self.sheet else self.excel_file.name
+
+
+def safe_str(value):
+    """Chuyển đổi giá trị ô Excel sang string an toàn"""
+    if isinstance(value, str):
+        return value.strip()
+    # value != value: NaN (ô trống khi đọc bằng pandas)
+    if value is None or value != value:
+        return ""
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+    return str(value).strip()
+
+
+def _header_names(header):
+    """Tên cột giống pandas: ô trống thành 'Unnamed: i', cột trùng tên thêm '.1', '.2'..."""
+    names = []
+    counts = {}
+    for i, cell in enumerate(header):
+        name = f"Unnamed: {i}" if cell is None else str(cell)
+        if name in counts:
+            counts[name] += 1
+            name = f"{name}.{counts[name]}"
+        else:
+            counts[name] = 0
+        names.append(name)
+    return names
+
+
+def list_sheets(excel_file):
+    """Tên các sheet trong file Excel"""
+    excel_file = Path(excel_file)
+    if excel_file.suffix.lower() == '.xls':
+        import pandas as pd
+
+        with pd.ExcelFile(excel_file) as workbook:
+            return list(workbook.sheet_names)
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(excel_file, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def find_sources(excel_files):
+    """Mọi sheet của các file Excel, mỗi sheet là một nguồn có thư mục kết quả riêng
+
+    File chỉ có một sheet dùng thư mục <tên file>, file nhiều sheet dùng
+    <tên file>/<tên sheet>.
+    """
+    sources = []
+    for excel_file in excel_files:
+        excel_file = Path(excel_file)
+        sheets = list_sheets(excel_file)
+        for sheet in sheets:
+            key = excel_file.stem if len(sheets) == 1 else f"{excel_file.stem}/{sheet.strip()}"
+            sources.append(RosterSource(excel_file, sheet, key))
+    return sources
+
+
+def _iter_openpyxl_rows(excel_file, header_row, sheet=None):
+    """Đọc từng hàng bằng openpyxl chế độ read-only (không nạp cả workbook)"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(min_row=header_row + 1, values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        yield _header_names(header)
+        for row in rows:
+            yield row
+    finally:
+        workbook.close()
+
+
+def _iter_pandas_rows(excel_file, header_row, sheet=None):
+    """Định dạng .xls cũ: openpyxl không đọc được, dùng pandas"""
+    import pandas as pd
+
+    df = pd.read_excel(excel_file, header=header_row, sheet_name=sheet if sheet else 0)
+    yield [str(column) for column in df.columns]
+    for row in df.itertuples(index=False, name=None):
+        yield row
+
+
+def iter_roster(excel_file, config=None, logger=None, sheet=None, group_by=None):
+    """Đọc danh sách người nhận theo kiểu stream, yield từng bản ghi đã chuẩn hóa
+
+    Mỗi bản ghi là một Record, seq đánh số từ 0 theo thứ tự được yield.
+    sheet là tên sheet cần đọc (mặc định: sheet đầu tiên).
+    group_by là cột dùng để chia nhóm (tên trong Excel như 'Đơn vị' hoặc tên
+    trong chương trình như 'DonVi'); giá trị được gán vào record.group.
+    Áp dụng cùng quy tắc như khi đọc bằng pandas: hàng tiêu đề theo [EXCEL]
+    header_row, bỏ hàng không có họ tên, lọc theo filter_value trên cột Ghi chú
+    (nếu không có hàng nào khớp thì giữ nguyên danh sách). Khi lọc, các hàng
+    đứng trước hàng khớp đầu tiên được giữ tạm cho tới khi biết có lọc hay không.
+    """
+    excel_file = Path(excel_file)
+    header_row = (config.getint('EXCEL', 'header_row', fallback=5) if config else 5) - 1
+    filter_column = config.get('EXCEL', 'filter_column', fallback='') if config else ''
+    filter_value = config.get('EXCEL', 'filter_value', fallback='') if config else ''
+
+    if excel_file.suffix.lower() == '.xls':
+        rows = _iter_pandas_rows(excel_file, header_row, sheet)
+    else:
+        rows = _iter_openpyxl_rows(excel_file, header_row, sheet)
+
+    columns = next(rows, None)
+    if columns is None:
+        return
+    if NAME_COLUMN not in columns:
+        rows.close()
+        raise ValueError(f"Không tìm thấy cột '{NAME_COLUMN}' ở hàng {header_row + 1}")
+    index = {}
+    for i, column in enumerate(columns):
+        index.setdefault(COLUMN_MAPPING.get(column, column), i)
+    filtering = bool(filter_column and filter_value and 'GhiChu' in index)
+    picked = RECORD_COLUMNS
+    if group_by:
+        group_column = COLUMN_MAPPING.get(group_by, group_by)
+        if group_column not in index:
+            rows.close()
+            raise ValueError(f"Không tìm thấy cột nhóm '{group_by}' ở hàng {header_row + 1}")
+        picked = RECORD_COLUMNS + (group_column,)
+
+    # Lấy các cột cần dùng của một hàng trong một lần gọi; cột không có thì
+    # trỏ tới ô None được thêm vào cuối mỗi hàng
+    width = len(columns)
+    pick = itemgetter(*(index.get(name, width) for name in picked))
+    padding = (None,) * (width + 1)
+
+    seq = 0
+    matched = False
+    held = []
+
+    for idx, row in enumerate(rows):
+        ho_ten, stt, phap_danh, nam_sinh, don_vi, ghi_chu, *group = pick(row[:width] + padding[min(len(row), width):])
+        if ho_ten is None or ho_ten != ho_ten:
+            continue
+
+        try:
+            stt = int(float(safe_str(stt)))
+        except ValueError:
+            stt = idx + 1
+        record = Record(
+            seq, stt, safe_str(ho_ten), safe_str(phap_danh), safe_str(nam_sinh), safe_str(don_vi)
+        )
+        if group:
+            record.group = safe_str(group[0])
+
+        if not filtering:
+            seq += 1
+            yield record
+        elif ghi_chu == filter_value:
+            if not matched:
+                matched = True
+                held = None
+                if logger:
+                    logger.info(f"🔍 Đã lọc theo điều kiện: {filter_column} = {filter_value}")
+            record.seq = seq
+            seq += 1
+            yield record
+        elif not matched:
+            record.seq = len(held)
+            held.append(record)
+
+    # Không có hàng nào khớp điều kiện lọc: giữ nguyên danh sách
+    if filtering and not matched:
+        yield from held
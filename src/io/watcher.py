@@ -0,0 +1,65 @@
+from pathlib import Path
+
+
+def file_stamp(path):
+    """(thời gian sửa, kích thước) của file, None nếu file không tồn tại"""
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FolderWatcher:
+    """Theo dõi một thư mục bằng cách quét định kỳ (không cần thư viện ngoài)
+
+    poll() trả về các file mới hoặc đã sửa kể từ lần trước. Một file chỉ được
+    báo khi thời gian sửa và kích thước không đổi giữa hai lần quét liên tiếp,
+    tức là đã chép/lưu xong. skip_existing=True: các file có sẵn lúc bắt đầu
+    không được báo (chỉ báo khi chúng bị sửa).
+    """
+
+    def __init__(self, folder, suffixes=None, recursive=False, skip_existing=False):
+        self.folder = Path(folder)
+        self.suffixes = tuple(suffix.lower() for suffix in suffixes) if suffixes else None
+        self.recursive = recursive
+        # file → stamp đã báo (đã xử lý)
+        self._seen = self._scan() if skip_existing else {}
+        # file → stamp ở lần quét trước, đang chờ ổn định
+        self._pending = {}
+
+    def _scan(self):
+        if not self.folder.is_dir():
+            return {}
+        paths = self.folder.rglob('*') if self.recursive else self.folder.iterdir()
+        found = {}
+        for path in paths:
+            # Bỏ qua file khóa của Office (~$ds.xlsx) và file tạm
+            if path.name.startswith(('~$', '.')) or path.name.endswith('.part'):
+                continue
+            if self.suffixes and path.suffix.lower() not in self.suffixes:
+                continue
+            stamp = file_stamp(path)
+            if stamp and path.is_file():
+                found[path] = stamp
+        return found
+
+    @property
+    def files(self):
+        """Các file đã được báo và vẫn còn tồn tại, theo tên"""
+        return sorted(self._seen)
+
+    def poll(self):
+        current = self._scan()
+        changed = []
+        for path, stamp in current.items():
+            if self._seen.get(path) == stamp:
+                continue
+            if self._pending.get(path) == stamp:
+                self._seen[path] = stamp
+                changed.append(path)
+        self._pending = {path: stamp for path, stamp in current.items() if self._seen.get(path) != stamp}
+        # File đã bị xóa: lần sau xuất hiện lại được coi là file mới
+        for path in [path for path in self._seen if path not in current]:
+            del self._seen[path]
+        return sorted(changed)
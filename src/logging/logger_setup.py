@@ -1,43 +1,111 @@
+import atexit
+import configparser
 import logging
+import queue
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
-def setup_logger(name, level="INFO", log_to_file=True):
-    """Thiết lập logger"""
+# Thread ghi log nền của từng logger (chế độ queued)
+_listeners = {}
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Đưa record vào hàng đợi nguyên trạng - việc format và ghi do thread nền làm"""
+
+    def prepare(self, record):
+        return record
+
+
+def logging_settings(config):
+    """Tham số cho setup_logger lấy từ mục [LOGGING] của config.ini (thiếu mục thì dùng giá trị mặc định)"""
+    if config is None:
+        config = configparser.ConfigParser()
+    return {
+        'level': config.get('LOGGING', 'log_level', fallback='INFO').strip() or 'INFO',
+        'log_to_file': config.getboolean('LOGGING', 'log_to_file', fallback=True),
+        'log_to_console': config.getboolean('LOGGING', 'log_to_console', fallback=True),
+        'queued': config.getboolean('LOGGING', 'async_logging', fallback=True),
+    }
+
+
+def setup_logger(name, level="INFO", log_to_file=True, log_to_console=True, queued=False, reset=False):
+    """Thiết lập logger
+
+    queued=True: logger chỉ đưa record vào hàng đợi, một thread nền lo việc
+    format và ghi ra console/file nên vòng xử lý không bị chậm vì ghi log.
+    reset=True: bỏ các handler có sẵn (tiến trình worker kế thừa từ tiến trình cha).
+    """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    if reset:
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        # Thread nền của tiến trình cha không tồn tại trong tiến trình con
+        _listeners.pop(name, None)
+
+    # Set level (cả khi logger đã được thiết lập - gọi lại không làm mất mức log)
+    numeric_level = getattr(logging, level.upper(), logging.INFO)
+    logger.setLevel(numeric_level)
     # Tránh tạo handler trùng
     if logger.handlers:
         return logger
-    
-    # Set level
-    numeric_level = getattr(logging, level.upper(), logging.INFO)
-    logger.setLevel(numeric_level)
-    
+
     # Formatter
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
+    handlers = []
+    file_error = None
+
     # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(numeric_level)
-    logger.addHandler(console_handler)
-    
+    if log_to_console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        console_handler.setLevel(numeric_level)
+        handlers.append(console_handler)
+
     # File handler
     if log_to_file:
         try:
             log_dir = Path("logs")
             log_dir.mkdir(exist_ok=True)
-            
+
             log_file = log_dir / f"{name}_{datetime.now().strftime('%Y%m%d')}.log"
             file_handler = logging.FileHandler(log_file, encoding='utf-8')
             file_handler.setFormatter(formatter)
             file_handler.setLevel(numeric_level)
-            logger.addHandler(file_handler)
+            handlers.append(file_handler)
         except Exception as e:
-            logger.warning(f"Không thể tạo log file: {e}")
-    
-    return logger
\ No newline at end of file
+            file_error = e
+
+    if not handlers:
+        logger.addHandler(logging.NullHandler())
+    elif queued:
+        log_queue = queue.SimpleQueue()
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        _listeners[name] = listener
+        logger.addHandler(_DeferredQueueHandler(log_queue))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+
+    if file_error:
+        logger.warning(f"Không thể tạo log file: {file_error}")
+    return logger
+
+
+def stop_logger(name):
+    """Dừng thread ghi log nền của logger (ghi nốt các dòng còn trong hàng đợi)"""
+    listener = _listeners.pop(name, None)
+    if listener:
+        listener.stop()
+
+
+def _stop_all():
+    for name in list(_listeners):
+        stop_logger(name)
+
+
+atexit.register(_stop_all)
@@ -0,0 +1,212 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+# Thứ tự các bước khi in bảng thống kê
+STAGES = ('roster_load', 'template_prepare', 'render', 'save', 'convert', 'merge', 'merge_finalize', 'cleanup')
+QUANTILES = (0.5, 0.95)
+METRIC_PREFIX = 'certifynow'
+
+
+def percentile(sorted_values, q):
+    """Phân vị theo nearest-rank trên danh sách đã sắp xếp"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class RunMetrics:
+    """Thời gian từng bước của một lượt chạy
+
+    Mỗi bước giữ danh sách thời gian (giây) của từng lần thực hiện: render,
+    save, convert, merge là theo từng giấy khen; các bước khác thường chỉ có
+    một mẫu. Có thể ghi từ nhiều thread (bước chuyển PDF chạy song song).
+    window: chỉ giữ bấy nhiêu mẫu gần nhất của mỗi bước (dịch vụ chạy lâu dài).
+    """
+
+    def __init__(self, slowest=5, window=None):
+        self.samples = {}
+        self.window = window
+        self.record_times = {}
+        self.slowest_count = slowest
+        self.started = time.monotonic()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, record=None):
+        """Thêm một mẫu thời gian; record (nếu có) được dùng để tìm giấy khen chậm nhất"""
+        with self._lock:
+            values = self.samples.get(stage)
+            if values is None:
+                values = self.samples[stage] = deque(maxlen=self.window) if self.window else []
+            values.append(seconds)
+            if record is not None:
+                key = (record.source.key if record.source else '', record.seq)
+                entry = self.record_times.get(key)
+                if entry is None:
+                    entry = self.record_times[key] = {'stt': record.stt, 'ho_ten': record.ho_ten, 'stages': {}}
+                    if record.source and record.source.key:
+                        entry['source'] = record.source.key
+                entry['stages'][stage] = entry['stages'].get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name, record=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started, record)
+
+    def timed_iter(self, name, iterable):
+        """Cộng dồn thời gian lấy từng phần tử của iterable vào một bước (vd. đọc danh sách)"""
+        iterator = iter(iterable)
+        elapsed = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield item
+        finally:
+            self.add(name, elapsed)
+
+    def finish(self):
+        self.finished = time.monotonic()
+
+    @property
+    def duration(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    def stage_summary(self):
+        """p50/p95/max/tổng (giây) của từng bước"""
+        summary = {}
+        with self._lock:
+            items = {stage: sorted(values) for stage, values in self.samples.items()}
+        for stage in sorted(items, key=lambda s: (STAGES.index(s) if s in STAGES else len(STAGES), s)):
+            values = items[stage]
+            summary[stage] = {
+                'count': len(values),
+                'total_s': round(sum(values), 4),
+                'p50_ms': round(percentile(values, 0.5) * 1000, 3),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+                'max_ms': round(values[-1] * 1000, 3) if values else 0.0,
+            }
+        return summary
+
+    def slowest(self):
+        """Các giấy khen tốn nhiều thời gian nhất (cộng mọi bước)"""
+        with self._lock:
+            entries = list(self.record_times.values())
+        entries.sort(key=lambda entry: sum(entry['stages'].values()), reverse=True)
+        result = []
+        for entry in entries[:self.slowest_count]:
+            item = {k: v for k, v in entry.items() if k != 'stages'}
+            item['total_ms'] = round(sum(entry['stages'].values()) * 1000, 3)
+            item['stages_ms'] = {stage: round(s * 1000, 3) for stage, s in entry['stages'].items()}
+            result.append(item)
+        return result
+
+    def summary(self, created=0):
+        duration = self.duration
+        return {
+            'duration_s': round(duration, 3),
+            'certificates_per_second': round(created / duration, 3) if duration > 0 else 0.0,
+            'stages': self.stage_summary(),
+            'slowest': self.slowest(),
+        }
+
+    def print_summary(self, created=0):
+        summary = self.summary(created)
+        print("\n⏱️ THỐNG KÊ THỜI GIAN:")
+        print("-" * 70)
+        print(f"{'Bước':16} | {'Số lần':>7} | {'p50 ms':>9} | {'p95 ms':>9} | {'max ms':>9} | {'Tổng s':>8}")
+        print("-" * 70)
+        for stage, data in summary['stages'].items():
+            print(
+                f"{stage:16} | {data['count']:7d} | {data['p50_ms']:9.1f} | {data['p95_ms']:9.1f} | "
+                f"{data['max_ms']:9.1f} | {data['total_s']:8.2f}"
+            )
+        print("-" * 70)
+        print(f"🚀 Tốc độ: {summary['certificates_per_second']:.2f} giấy khen/giây "
+              f"({summary['duration_s']:.1f}s)")
+        if summary['slowest']:
+            print("🐢 Chậm nhất:")
+            for entry in summary['slowest']:
+                source = f"[{entry['source']}] " if entry.get('source') else ""
+                print(f"   {source}{entry['stt']:3d} {entry['ho_ten']}: {entry['total_ms']:.0f} ms")
+        return summary
+
+    def write_prometheus(self, path, counts=None, labels=None):
+        """Ghi metrics dạng text của Prometheus (dùng cho textfile collector của node_exporter)
+
+        counts: số giấy khen theo trạng thái (created / unchanged / failed).
+        """
+        labels = labels or {}
+
+        def fmt(extra=None):
+            merged = dict(labels, **(extra or {}))
+            if not merged:
+                return ''
+            escaped = (
+                f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                for k, v in merged.items()
+            )
+            return '{' + ','.join(escaped) + '}'
+
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [
+            f"# HELP {name} Thời gian từng bước của lượt chạy tạo giấy khen",
+            f"# TYPE {name} summary",
+        ]
+        with self._lock:
+            items = {stage: sorted(values) for stage, values in self.samples.items()}
+        for stage, values in items.items():
+            for q in QUANTILES:
+                lines.append(f"{name}{fmt({'stage': stage, 'quantile': q})} {percentile(values, q):.6f}")
+            lines.append(f"{name}_sum{fmt({'stage': stage})} {sum(values):.6f}")
+            lines.append(f"{name}_count{fmt({'stage': stage})} {len(values)}")
+
+        lines += [
+            f"# HELP {METRIC_PREFIX}_stage_max_seconds Thời gian lâu nhất của một lần thực hiện mỗi bước",
+            f"# TYPE {METRIC_PREFIX}_stage_max_seconds gauge",
+        ]
+        for stage, values in items.items():
+            lines.append(f"{METRIC_PREFIX}_stage_max_seconds{fmt({'stage': stage})} {values[-1]:.6f}")
+
+        counts = counts or {}
+        created = counts.get('created', 0)
+        lines += [
+            f"# HELP {METRIC_PREFIX}_certificates Số giấy khen của lượt chạy theo trạng thái",
+            f"# TYPE {METRIC_PREFIX}_certificates gauge",
+        ]
+        for status, value in counts.items():
+            lines.append(f"{METRIC_PREFIX}_certificates{fmt({'status': status})} {value}")
+
+        duration = self.duration
+        lines += [
+            f"# HELP {METRIC_PREFIX}_certificates_per_second Số giấy khen tạo được mỗi giây",
+            f"# TYPE {METRIC_PREFIX}_certificates_per_second gauge",
+            f"{METRIC_PREFIX}_certificates_per_second{fmt()} {created / duration if duration > 0 else 0:.6f}",
+            f"# HELP {METRIC_PREFIX}_run_duration_seconds Tổng thời gian lượt chạy",
+            f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge",
+            f"{METRIC_PREFIX}_run_duration_seconds{fmt()} {duration:.6f}",
+            f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds Thời điểm kết thúc lượt chạy (unix time)",
+            f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRIC_PREFIX}_last_run_timestamp_seconds{fmt()} {time.time():.0f}",
+        ]
+
+        # Ghi file tạm rồi đổi tên để collector không đọc phải file dở dang
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + '.tmp')
+        partial.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        os.replace(partial, path)
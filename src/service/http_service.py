@@ -0,0 +1,150 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from src.certificate.streaming import RECORD_FIELDS, as_record, render_pdf_bytes
+from src.io.roster import FILENAME_TABLE
+from src.logging.metrics import RunMetrics
+
+# Kích thước tối đa của body yêu cầu (byte)
+MAX_BODY = 64 * 1024
+# Mục tiêu p95 cho một giấy khen (ms)
+P95_TARGET_MS = 1000
+# Số yêu cầu gần nhất dùng để tính thống kê thời gian
+STATS_WINDOW = 1000
+
+
+class CertificateService:
+    """Tạo giấy khen đơn lẻ theo yêu cầu, dùng lại template và bộ chuyển PDF đã nạp sẵn
+
+    Bước render thay placeholder trên template dùng chung nên chạy tuần tự
+    (vài ms); bước chuyển PDF chạy song song theo số instance của bộ chuyển.
+    Thời gian của STATS_WINDOW yêu cầu gần nhất được giữ trong metrics
+    (queue, render, convert, request) nên bộ nhớ không tăng theo thời gian chạy.
+    """
+
+    def __init__(self, generator, converter=None, logger=None):
+        self.generator = generator
+        self.converter = converter
+        self.logger = logger or logging.getLogger(__name__)
+        self.metrics = RunMetrics(window=STATS_WINDOW)
+        self.requests = 0
+        self._render_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+
+    def warm_up(self):
+        """Tạo thử một giấy khen để yêu cầu đầu tiên không phải chờ bộ chuyển PDF khởi động"""
+        try:
+            render_pdf_bytes(self.generator, as_record({'ho_ten': 'Nguyễn Văn A'}), self.converter, self._render_lock)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Không thể tạo thử giấy khen: {str(e)}")
+
+    def render_pdf(self, fields):
+        """Tạo PDF cho một người, trả về (nội dung PDF, thời gian từng bước tính bằng giây)"""
+        started = time.perf_counter()
+        timings = {}
+        data = render_pdf_bytes(self.generator, as_record(fields), self.converter, self._render_lock, timings)
+        timings['request'] = time.perf_counter() - started
+        with self._count_lock:
+            self.requests += 1
+        for stage, seconds in timings.items():
+            self.metrics.add(stage, seconds)
+        if timings['request'] * 1000 > P95_TARGET_MS:
+            self.logger.warning(f"🐢 Giấy khen {fields.get('ho_ten')} mất {timings['request'] * 1000:.0f} ms")
+        return data, timings
+
+    def stats(self):
+        """Thống kê thời gian các yêu cầu gần nhất (p50/p95/max) và so với mục tiêu p95"""
+        stages = self.metrics.stage_summary()
+        request = stages.get('request', {})
+        return {
+            'requests': self.requests,
+            'window': STATS_WINDOW,
+            'p95_target_ms': P95_TARGET_MS,
+            'p95_ok': request.get('p95_ms', 0.0) <= P95_TARGET_MS,
+            'stages': stages,
+        }
+
+
+class _CertificateHandler(BaseHTTPRequestHandler):
+    """POST /certificate (JSON) → PDF; GET /health; GET /stats"""
+
+    server_version = 'CertifyNow'
+    service = None
+
+    def do_GET(self):
+        if self.path == '/health':
+            generator = self.service.generator
+            self._send_json(200, {
+                'status': 'ok',
+                'engine': generator.render_engine,
+                'template': str(generator.template_path),
+            })
+        elif self.path == '/stats':
+            self._send_json(200, self.service.stats())
+        else:
+            self._send_json(404, {'error': f"Không có đường dẫn {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/certificate':
+            self._send_json(404, {'error': f"Không có đường dẫn {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {'error': "Content-Length không hợp lệ"})
+            return
+        if length > MAX_BODY:
+            self._send_json(413, {'error': "Yêu cầu quá lớn"})
+            return
+        try:
+            fields = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': "Body phải là JSON"})
+            return
+        if not isinstance(fields, dict) or not str(fields.get('ho_ten') or '').strip():
+            self._send_json(400, {'error': f"Cần trường ho_ten (các trường: {', '.join(RECORD_FIELDS)})"})
+            return
+
+        try:
+            data, timings = self.service.render_pdf(fields)
+        except Exception as e:
+            self.service.logger.error(f"❌ Lỗi tạo giấy khen {fields.get('ho_ten')}: {str(e)}")
+            self._send_json(500, {'error': str(e)})
+            return
+
+        filename = f"{str(fields['ho_ten']).strip().translate(FILENAME_TABLE)}.pdf"
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/pdf')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(filename)}")
+        # Thời gian từng bước, xem được trong tab Network của trình duyệt
+        self.send_header('Server-Timing', ', '.join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()
+        ))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.service.logger.debug(f"🌐 {self.address_string()} {format % args}")
+
+
+def create_server(service, host='127.0.0.1', port=8765):
+    """Tạo HTTP server đa luồng (mỗi yêu cầu một thread) cho CertificateService"""
+    handler = type('CertificateHandler', (_CertificateHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import pytest
+from docx import Document
+from docx.oxml import parse_xml
+
+# Chạy pytest từ bất kỳ thư mục nào vẫn import được src.*
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+
+@pytest.fixture
+def template_file(tmp_path):
+    """Template .docx nhỏ: placeholder bị tách qua nhiều run, placeholder lạ và tooltip chứa placeholder"""
+    document = Document()
+    paragraph = document.add_paragraph('Họ tên: ')
+    paragraph.add_run('<<ho')
+    paragraph.add_run('_ten>>').bold = True
+    paragraph.add_run(' - <<khong_co>>')
+    document.add_paragraph('Đơn vị: <<don_vi>>')
+    # Hyperlink có placeholder trong thuộc tính tooltip - không được thay
+    document.paragraphs[1]._p.append(parse_xml(
+        f'<w:hyperlink xmlns:w="{W_NS}" w:tooltip="&lt;&lt;ho_ten&gt;&gt;" w:anchor="top">'
+        f'<w:r><w:t>liên kết</w:t></w:r></w:hyperlink>'
+    ))
+    path = tmp_path / 'template.docx'
+    document.save(str(path))
+    return path
+
+
+@pytest.fixture
+def full_template_file(tmp_path):
+    """Template có placeholder ở header, bảng và paragraph có định dạng riêng cho từng run"""
+    document = Document()
+    document.sections[0].header.paragraphs[0].text = 'Đơn vị cấp: <<Do>>'
+    paragraph = document.add_paragraph('Chứng nhận: ')
+    paragraph.add_run('<<Ho_va').bold = True
+    paragraph.add_run('_ten>>')
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = 'Năm sinh'
+    table.cell(0, 1).text = '<<Nam_sinh>>'
+    path = tmp_path / 'full_template.docx'
+    document.save(str(path))
+    return path
@@ -0,0 +1,71 @@
+import io
+import zipfile
+
+from docx import Document
+
+from src.certificate.docx_package import ZipTemplate
+from src.certificate.template import CompiledTemplate
+
+W_TOOLTIP = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tooltip'
+
+
+def _render(engine, template_file, replacements):
+    output = io.BytesIO()
+    replaced = engine(template_file).render(replacements, output)
+    output.seek(0)
+    return replaced, Document(output)
+
+
+def test_value_with_xml_special_characters(template_file):
+    value = 'A "B" & <C>'
+    replaced, document = _render(ZipTemplate, template_file, {'<<ho_ten>>': value})
+
+    assert replaced == 1
+    assert document.paragraphs[0].text == f'Họ tên: {value} - <<khong_co>>'
+    tooltip = document.paragraphs[1]._p.xpath('.//w:hyperlink')[0].get(W_TOOLTIP)
+    assert tooltip == '<<ho_ten>>'
+
+
+def test_zip_and_compiled_engines_count_the_same(template_file):
+    replacements = {'<<ho_ten>>': 'A "B" & <C>', '<<don_vi>>': 'Đơn vị 1'}
+    zip_replaced, zip_document = _render(ZipTemplate, template_file, replacements)
+    docx_replaced, docx_document = _render(CompiledTemplate, template_file, replacements)
+
+    assert zip_replaced == docx_replaced == 2
+    assert [p.text for p in zip_document.paragraphs] == [p.text for p in docx_document.paragraphs]
+
+
+def test_round_trip_through_python_docx(full_template_file):
+    replacements = {'<<Ho_va_ten>>': 'Trần Thị B', '<<Nam_sinh>>': '2001', '<<Do>>': 'Ban Hướng Dẫn'}
+    replaced, document = _render(ZipTemplate, full_template_file, replacements)
+
+    assert replaced == 3
+    assert document.sections[0].header.paragraphs[0].text == 'Đơn vị cấp: Ban Hướng Dẫn'
+    paragraph = document.paragraphs[0]
+    assert paragraph.text == 'Chứng nhận: Trần Thị B'
+    # Giá trị nằm trong run chứa ký tự đầu của placeholder, giữ định dạng của run đó
+    assert [(run.text, run.bold) for run in paragraph.runs] == [('Chứng nhận: ', None), ('Trần Thị B', True), ('', None)]
+    assert document.tables[0].cell(0, 1).text == '2001'
+
+
+def test_parts_without_placeholders_are_copied_unchanged(full_template_file, tmp_path):
+    output = tmp_path / 'out' / 'giay_khen.docx'
+    template = ZipTemplate(full_template_file)
+    template.render({'<<Ho_va_ten>>': 'C'}, output)
+
+    assert sorted(template.text_parts) == ['word/document.xml', 'word/header1.xml']
+    with zipfile.ZipFile(full_template_file) as source, zipfile.ZipFile(output) as result:
+        assert result.testzip() is None
+        assert result.namelist() == source.namelist()
+        for name in source.namelist():
+            if name not in template.text_parts:
+                assert result.read(name) == source.read(name)
+
+
+def test_each_render_starts_from_the_template(full_template_file):
+    template = ZipTemplate(full_template_file)
+    for name in ('Người thứ nhất', 'Người 2'):
+        output = io.BytesIO()
+        template.render({'<<Ho_va_ten>>': name}, output)
+        output.seek(0)
+        assert Document(output).paragraphs[0].text == f'Chứng nhận: {name}'
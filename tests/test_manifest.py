@@ -0,0 +1,91 @@
+import configparser
+
+import pytest
+
+from src.io.manifest import MANIFEST_NAME, RunManifest, content_fingerprint
+from src.io.roster import Record
+
+
+def _config(**certificate):
+    config = configparser.ConfigParser()
+    config.read_dict({'CERTIFICATE': dict({'issued_date': 'ngày 15 tháng 8 năm 2025'}, **certificate)})
+    return config
+
+
+@pytest.fixture
+def files(tmp_path):
+    template = tmp_path / 'template.docx'
+    template.write_bytes(b'template v1')
+    font = tmp_path / 'font.ttf'
+    font.write_bytes(b'font v1')
+    output = tmp_path / 'output'
+    output.mkdir()
+    return template, font, output
+
+
+def _record(output, ho_ten='Nguyễn Văn A', don_vi='GĐPT Hải Châu'):
+    record = Record(0, 1, ho_ten, '', '2000', don_vi)
+    record.pdf_file = output / f"{record.file_stem}.pdf"
+    record.pdf_file.write_bytes(b'%PDF')
+    return record
+
+
+def _reload(output, template, font, config):
+    return RunManifest.for_run(output, template, config, [font])
+
+
+def test_unchanged_record_is_skipped_after_reload(files):
+    template, font, output = files
+    manifest = _reload(output, template, font, _config())
+    record = _record(output)
+    assert not manifest.is_current(record)
+    manifest.mark(record)
+    manifest.save()
+
+    assert (output / MANIFEST_NAME).exists()
+    assert _reload(output, template, font, _config()).is_current(record)
+
+
+def test_changed_record_or_missing_pdf_is_rebuilt(files):
+    template, font, output = files
+    manifest = _reload(output, template, font, _config())
+    record = _record(output)
+    manifest.mark(record)
+
+    edited = _record(output, don_vi='GĐPT Sơn Trà')
+    assert not manifest.is_current(edited)
+    record.pdf_file.unlink()
+    assert not manifest.is_current(record)
+
+
+@pytest.mark.parametrize('change', ['template', 'asset', 'config'])
+def test_template_asset_or_config_change_invalidates(files, change):
+    template, font, output = files
+    manifest = _reload(output, template, font, _config())
+    record = _record(output)
+    manifest.mark(record)
+    manifest.save()
+
+    config = _config()
+    if change == 'template':
+        template.write_bytes(b'template v2')
+    elif change == 'asset':
+        font.write_bytes(b'font v2')
+    else:
+        config = _config(issued_by='Ban Hướng Dẫn mới')
+    assert not _reload(output, template, font, config).is_current(record)
+
+
+def test_fingerprint_ignores_file_timestamps(files):
+    template, font, _ = files
+    before = content_fingerprint(template, _config(), [font])
+    template.write_bytes(b'template v1')
+    assert content_fingerprint(template, _config(), [font]) == before
+
+
+def test_unreadable_manifest_starts_empty(files):
+    template, font, output = files
+    (output / MANIFEST_NAME).write_text('{hỏng', encoding='utf-8')
+    manifest = _reload(output, template, font, _config())
+    assert manifest.entries == {}
+    assert not manifest.is_current(_record(output))
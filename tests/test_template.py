@@ -0,0 +1,67 @@
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from src.certificate.template import W_NS, XML_SPACE, iter_text_paragraphs, substitute_placeholders
+
+REPLACEMENTS = {'<<Ho_va_ten>>': 'Nguyễn Văn A', '<<Don_vi>>': '', '<<Do>>': 'Ban Hướng Dẫn'}
+
+
+def _paragraph(*texts):
+    """Paragraph có mỗi phần tử của texts là một run (None = w:t rỗng không có text)"""
+    runs = ''.join('<w:r><w:t/></w:r>' if text is None else f'<w:r><w:t>{escape(text)}</w:t></w:r>' for text in texts)
+    root = etree.fromstring(f'<w:body xmlns:w="{W_NS}"><w:p>{runs}</w:p></w:body>')
+    return next(iter_text_paragraphs(root))[1]
+
+
+def _texts(nodes):
+    return [t.text or '' for t in nodes]
+
+
+def test_placeholder_in_single_run():
+    nodes = _paragraph('Chứng nhận: <<Ho_va_ten>>')
+    assert substitute_placeholders(nodes, REPLACEMENTS) == 1
+    assert _texts(nodes) == ['Chứng nhận: Nguyễn Văn A']
+
+
+def test_placeholder_split_across_runs():
+    nodes = _paragraph('Họ tên: <<Ho', '_va', '_ten>> (', '<<Do>>)')
+    assert substitute_placeholders(nodes, REPLACEMENTS) == 2
+    # Giá trị nằm ở run chứa ký tự đầu; các run còn lại chỉ bị cắt phần placeholder
+    assert _texts(nodes) == ['Họ tên: Nguyễn Văn A', '', ' (', 'Ban Hướng Dẫn)']
+    assert nodes[0].get(XML_SPACE) == 'preserve'
+
+
+def test_runs_outside_placeholders_are_untouched():
+    nodes = _paragraph('Trước ', '<<Do>>', ' sau')
+    substitute_placeholders(nodes, REPLACEMENTS)
+    assert _texts(nodes) == ['Trước ', 'Ban Hướng Dẫn', ' sau']
+    assert nodes[0].get(XML_SPACE) is None
+    assert nodes[2].get(XML_SPACE) is None
+
+
+def test_empty_nodes_and_empty_value():
+    nodes = _paragraph(None, '<<Don', None, '_vi>>', None, '!')
+    assert substitute_placeholders(nodes, REPLACEMENTS) == 1
+    assert ''.join(_texts(nodes)) == '!'
+
+
+def test_unknown_placeholder_kept_verbatim():
+    nodes = _paragraph('<<Khong', '_co>> và <<Do>>')
+    assert substitute_placeholders(nodes, REPLACEMENTS) == 1
+    assert _texts(nodes) == ['<<Khong', '_co>> và Ban Hướng Dẫn']
+
+
+def test_no_known_placeholder_returns_zero():
+    nodes = _paragraph('Không có gì', '<<La>>')
+    assert substitute_placeholders(nodes, REPLACEMENTS) == 0
+    assert _texts(nodes) == ['Không có gì', '<<La>>']
+
+
+def test_pristine_texts_are_used_instead_of_current():
+    nodes = _paragraph('<<Do>>')
+    pristine = _texts(nodes)
+    substitute_placeholders(nodes, REPLACEMENTS)
+    # Render lần hai từ text gốc (như PlaceholderSlot) vẫn tìm thấy placeholder
+    assert substitute_placeholders(nodes, {'<<Do>>': 'Khác'}, pristine) == 1
+    assert _texts(nodes) == ['Khác']